@@ -1,4 +1,3 @@
-import re
 import os
 from dotenv import load_dotenv
 import uuid
@@ -9,6 +8,15 @@ from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 from datetime import datetime
 import random
+import logging
+from contextlib import closing
+from retry_utils import call_with_retry
+from question_pool import draw_questions, return_questions
+from quiz_history import get_recent_wrong_questions
+from content_cache import get_topic_content
+from mcq_parser import parse_mcq_response, iter_streamed_questions
+from llm_throttle import throttled_call, throttled_stream
+from sse_utils import token_text
 
 # Initialize Supabase client
 load_dotenv()
@@ -17,13 +25,16 @@ SUPABASE_URL = os.getenv("SUPABASE_URL", "https://bhrwvazkvsebdxstdcow.supabase.
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Follow-up requests allowed for questions that came back malformed
+MCQ_REPAIR_ATTEMPTS = int(os.getenv("MCQ_REPAIR_ATTEMPTS", 2))
+
 # Generate UUID helper
 def generate_uuid():
     return str(uuid.uuid4())
 
 # Prompt template for 10 MCQ questions generation
 prompt_template = PromptTemplate(
-    input_variables=["content", "difficulty","number_of_questions"],
+    input_variables=["content", "difficulty", "num_questions"],
     template = """
         You are an intelligent quiz generator.
 
@@ -60,7 +71,7 @@ prompt_template = PromptTemplate(
         Answer: [Letter] - [Correct Answer Text]
         Explanation: Option B is correct because XYZ is defined as ABC in the text.
 
-        Repeat this format for all 10 questions.
+        Repeat this format for all {num_questions} questions.
 
         Content:
         {content}
@@ -70,42 +81,73 @@ prompt_template = PromptTemplate(
 
 
 # Initialize LangChain LLM chain
-def get_llm_chain(gemini_api_key: str):
-    llm = ChatGoogleGenerativeAI(
+def get_llm(gemini_api_key: str):
+    return ChatGoogleGenerativeAI(
         model="gemini-2.5-flash",
         google_api_key=gemini_api_key,
         temperature=0.3
     )
-    return LLMChain(llm=llm, prompt=prompt_template)
-
-# Parse LLM output into structured questions
-def parse_mcq_response(text: str):
-    questions = re.split(r"Question \d+:", text)[1:]
-    parsed_questions = []
-
-    for q in questions:
-        q_text_match = re.search(r"^(.*?)(?:\nA\))", q, re.DOTALL)
-        q_text = q_text_match.group(1).strip() if q_text_match else ""
 
-        opts_match = re.findall(r"[A-D]\)\s*(.*)", q)
-        options = opts_match if opts_match else []
-
-        ans_match = re.search(r"Answer:\s*\[?([A-D])\]?\s*-\s*(.*)", q)
-        correct_answer = ans_match.group(1) if ans_match else None
-        correct_text = ans_match.group(2).strip() if ans_match else ""
-
-        exp_match = re.search(r"Explanation:\s*(.*)", q)
-        explanation = exp_match.group(1).strip() if exp_match else "No explanation provided."
+def get_llm_chain(gemini_api_key: str):
+    return LLMChain(llm=get_llm(gemini_api_key), prompt=prompt_template)
+
+# Generate count valid questions, asking again only for the ones that failed validation
+def generate_valid_mcqs(chain, content: str, difficulty: str, count: int):
+    questions = []
+    for _ in range(MCQ_REPAIR_ATTEMPTS + 1):
+        missing = count - len(questions)
+        llm_response = throttled_call(chain.run, content=content, difficulty=difficulty, num_questions=missing, label="mcq generation")
+        questions.extend(parse_mcq_response(llm_response)[:missing])
+        if len(questions) >= count:
+            return questions
+        logging.warning(f"⚠️ Got {len(questions)}/{count} valid questions, requesting the {count - len(questions)} missing")
+    raise Exception(f"Expected {count} questions, got {len(questions)}.")
+
+def _question_to_row(topic_id: str, q: dict, created_at: str):
+    explanation = q.get("explanation") or f"The correct answer is option {q['correct_answer']} because it best reflects the core idea from the content."
+    return {
+        "question_id": q.get("question_id") or generate_uuid(),
+        "concept_id": topic_id,
+        "prompt": q["question_text"],
+        "answer": q["correct_answer"],
+        "answer_option_text": json.dumps({
+            "A": q["options"][0],
+            "B": q["options"][1],
+            "C": q["options"][2],
+            "D": q["options"][3]
+        }),
+        "explanation": explanation,
+        "created_at": created_at
+    }
+
+def _row_to_question(row: dict):
+    options_map = json.loads(row["answer_option_text"])
+    return {
+        "question_id": row["question_id"],
+        "question_text": row["prompt"],
+        "options": [options_map[letter] for letter in ("A", "B", "C", "D")],
+        "correct_answer": row["answer"],
+        "answer_text": options_map.get(row["answer"], "N/A"),
+        "explanation": row["explanation"]
+    }
+
+# Persist a quiz's questions with a single bulk write
+def save_questions(topic_id: str, questions: list):
+    created_at = datetime.now().isoformat()
+    rows = [_question_to_row(topic_id, q, created_at) for q in questions]
+
+    # One statement, so the whole quiz is written or none of it is. Upserting on the
+    # pre-generated ids keeps a retry after a lost response from duplicating rows.
+    response = call_with_retry(
+        lambda: supabase.table("quiz_questions").upsert(rows, on_conflict="question_id").execute(),
+        label="quiz_questions bulk insert"
+    )
+    if not response.data or len(response.data) != len(rows):
+        raise Exception(f"Failed to save quiz questions: expected {len(rows)} rows, got {len(response.data or [])}.")
 
-        if q_text and options and correct_answer:
-            parsed_questions.append({
-                "question_text": q_text,
-                "options": options,
-                "correct_answer": correct_answer,
-                "correct_text": correct_text,
-                "explanation": explanation,
-            })
-    return parsed_questions
+    # Return the persisted rows in the order they were generated
+    saved_by_id = {row["question_id"]: row for row in response.data}
+    return [_row_to_question(saved_by_id[row["question_id"]]) for row in rows]
 
 # Main function: generate & save questions for a topic
 # def generate_and_save_mcqs(topic_id: str, gemini_api_key: str, difficulty_mode: str = "hard",user_id: str = None):
@@ -162,100 +204,109 @@ def parse_mcq_response(text: str):
 #     return saved_questions
 
 
-def generate_and_save_mcqs(topic_id: str, gemini_api_key: str, difficulty_mode: str = "hard", user_id: str = None):
-    # Fetch topic content
-    topic_res = supabase.table("topics").select("merged_content").eq("topic_id", topic_id).single().execute()
-    if not topic_res.data:
-        raise Exception(f"Topic with ID {topic_id} not found")
+# Up to 4 questions the user got wrong in their last attempt on this topic
+def _load_mistake_questions(topic_id: str, user_id: str):
+    wrong_questions = get_recent_wrong_questions(supabase, user_id, topic_id)
 
-    merged_content = topic_res.data["merged_content"]
     mistake_questions = []
+    for reused in random.sample(wrong_questions, min(4, len(wrong_questions))):
+        options_map = json.loads(reused["answer_option_text"])
+        mistake_questions.append({
+            "question_text": reused["prompt"],
+            "options": list(options_map.values()),
+            "correct_answer": reused["answer"],
+            "correct_text": options_map[reused["answer"]],
+            "explanation": reused.get("explanation") or "No explanation provided."
+        })
+    return mistake_questions
+
+# Questions available without an LLM call, plus how many still need generating
+def _plan_quiz(topic_id: str, difficulty_mode: str, user_id: str = None):
+    merged_content = get_topic_content(supabase, topic_id)
+    if merged_content is None:
+        raise Exception(f"Topic with ID {topic_id} not found")
 
     # --- Get up to 4 wrong questions if attempted ---
-    if user_id:
-        attempt_res = supabase.table("quiz_attempts") \
-            .select("attempt_id") \
-            .eq("user_id", user_id) \
-            .eq("topic_id", topic_id) \
-            .order("submitted_at", desc=True) \
-            .limit(1) \
-            .execute()
-
-        if attempt_res.data:
-            last_attempt_id = attempt_res.data[0]["attempt_id"]
-            wrong_ans_res = supabase.table("quiz_answers") \
-                .select("question_id") \
-                .eq("attempt_id", last_attempt_id) \
-                .eq("is_correct", False) \
-                .execute()
-
-            if wrong_ans_res.data:
-                wrong_qids = [a["question_id"] for a in wrong_ans_res.data]
-
-                wrong_qs_res = supabase.table("quiz_questions") \
-                    .select("question_id, prompt, answer, answer_option_text, explanation") \
-                    .in_("question_id", wrong_qids) \
-                    .execute()
-
-                if wrong_qs_res.data:
-                    mistake_questions = random.sample(wrong_qs_res.data, min(4, len(wrong_qs_res.data)))
-
-        # --- Prepare LLM input ---
-        mistake_count = len(mistake_questions)
-        num_to_generate = 10 - mistake_count
-
-        chain = get_llm_chain(gemini_api_key)
-        llm_response = chain.run(content=merged_content, difficulty=difficulty_mode, num_questions=num_to_generate)
-
-        # --- Parse generated questions ---
-        questions = parse_mcq_response(llm_response)
-        if len(questions) < num_to_generate:
-            raise Exception(f"Expected {num_to_generate} questions, got {len(questions)}.")
-
-        # --- Convert reused questions and prepend ---
-        for reused in mistake_questions:
-            options_map = json.loads(reused["answer_option_text"])
-            parsed = {
-                "question_text": reused["prompt"],
-                "options": list(options_map.values()),
-                "correct_answer": reused["answer"],
-                "correct_text": options_map[reused["answer"]],
-                "explanation": reused.get("explanation", "No explanation provided.")
-            }
-            questions.insert(0, parsed)
-
-        # --- Save all 10 questions ---
-        saved_questions = []
+    questions = _load_mistake_questions(topic_id, user_id) if user_id else []
 
+    # --- Serve pre-generated questions next, only call the LLM for any shortfall ---
+    num_to_generate = 10 - len(questions)
+    pooled = draw_questions(supabase, topic_id, difficulty_mode, num_to_generate)
+    questions.extend(pooled)
+    return merged_content, questions, num_to_generate - len(pooled), pooled
+
+
+def generate_and_save_mcqs(topic_id: str, gemini_api_key: str, difficulty_mode: str = "hard", user_id: str = None):
+    merged_content, questions, num_to_generate, pooled = _plan_quiz(topic_id, difficulty_mode, user_id)
+
+    try:
+        if num_to_generate > 0:
+            chain = get_llm_chain(gemini_api_key)
+            questions.extend(generate_valid_mcqs(chain, merged_content, difficulty_mode, num_to_generate))
+
+        # --- Save all 10 questions in one round-trip ---
+        return save_questions(topic_id, questions)
+    except Exception:
+        # The quiz was never saved, so the pooled questions weren't used
+        return_questions(supabase, topic_id, difficulty_mode, pooled)
+        raise
+
+
+def _question_for_client(q: dict):
+    letter_index = ord(q["correct_answer"]) - ord("A")
+    return {
+        "question_id": q["question_id"],
+        "question_text": q["question_text"],
+        "options": q["options"],
+        "correct_answer": q["correct_answer"],
+        "answer_text": q["options"][letter_index] if 0 <= letter_index < len(q["options"]) else "N/A",
+        "explanation": q.get("explanation")
+    }
+
+
+def stream_mcqs(topic_id: str, gemini_api_key: str, difficulty_mode: str = "hard", user_id: str = None):
+    """
+    Streaming variant of generate_and_save_mcqs.
+
+    Yields ("question", question) for every question as soon as it is ready:
+    reused and pooled questions first, then each generated question as its
+    block completes in the model's token stream. Ids are assigned up front,
+    and once the quiz is complete it is saved in one bulk write and
+    ("done", saved_questions) is yielded. Pooled questions go back to the
+    pool if the quiz is never saved.
+    """
+    merged_content, questions, num_to_generate, pooled = _plan_quiz(topic_id, difficulty_mode, user_id)
+
+    saved = None
+    try:
         for q in questions:
-            qid = generate_uuid()
-            correct_index = ord(q["correct_answer"]) - ord('A')
-            correct_text = q["options"][correct_index] if 0 <= correct_index < len(q["options"]) else "N/A"
-
-            explanation = q.get("explanation") or f"The correct answer is option {q['correct_answer']} because it best reflects the core idea from the content."
-
-            supabase.table("quiz_questions").insert({
-                "question_id": qid,
-                "concept_id": topic_id,
-                "prompt": q["question_text"],
-                "answer": q["correct_answer"],
-                "answer_option_text": json.dumps({
-                    "A": q["options"][0],
-                    "B": q["options"][1],
-                    "C": q["options"][2],
-                    "D": q["options"][3]
-                }),
-                "explanation": explanation,
-                "created_at": datetime.now().isoformat()
-            }).execute()
-
-            saved_questions.append({
-                "question_id": qid,
-                "question_text": q["question_text"],
-                "options": q["options"],
-                "correct_answer": q["correct_answer"],
-                "answer_text": correct_text,
-                "explanation": explanation
-            })
-
-        return saved_questions
\ No newline at end of file
+            q["question_id"] = generate_uuid()
+            yield "question", _question_for_client(q)
+
+        if num_to_generate > 0:
+            prompt = prompt_template.format(content=merged_content, difficulty=difficulty_mode, num_questions=num_to_generate)
+            generated = []
+            # closing() releases the rate limiter slot even when we stop reading early
+            with closing(throttled_stream(get_llm(gemini_api_key).stream, prompt, label="mcq stream")) as chunks:
+                for q in iter_streamed_questions(token_text(chunk) for chunk in chunks):
+                    generated.append(q)
+                    q["question_id"] = generate_uuid()
+                    yield "question", _question_for_client(q)
+                    if len(generated) == num_to_generate:
+                        break
+
+            # Malformed blocks were dropped by the parser; ask for just those again
+            missing = num_to_generate - len(generated)
+            if missing > 0:
+                for q in generate_valid_mcqs(get_llm_chain(gemini_api_key), merged_content, difficulty_mode, missing):
+                    generated.append(q)
+                    q["question_id"] = generate_uuid()
+                    yield "question", _question_for_client(q)
+            questions.extend(generated)
+
+        saved = save_questions(topic_id, questions)
+    finally:
+        # Covers errors and a client that stopped reading before the quiz was saved
+        if saved is None:
+            return_questions(supabase, topic_id, difficulty_mode, pooled)
+    yield "done", saved
@@ -4,8 +4,10 @@ from flask_mail import Mail
 from supabase import create_client
 from dotenv import load_dotenv
 from mailer import  init_mail
+from email_outbox import start_outbox_worker
 import os
 import logging
+import multiprocessing
 
 # Third-party scheduler
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -39,15 +41,16 @@ app.config['UPLOAD_FOLDER'] = 'uploads'
 
 # Setup Flask-Mail
 app.config.update(
-    MAIL_SERVER='smtp.gmail.com',
-    MAIL_PORT=587,
-    MAIL_USE_TLS=True,
+    MAIL_SERVER=os.getenv("MAIL_SERVER", 'smtp.gmail.com'),
+    MAIL_PORT=int(os.getenv("MAIL_PORT", 587)),
+    MAIL_USE_TLS=os.getenv("MAIL_USE_TLS", "true").lower() == "true",
     MAIL_USERNAME=GMAIL_USER,
     MAIL_PASSWORD=GMAIL_PASS,
     MAIL_DEFAULT_SENDER=GMAIL_USER,
 )
 
 init_mail(app)
+start_outbox_worker()
 # Initialize extensions
 # mail = Mail(app)
 
@@ -88,6 +91,7 @@ blueprints = [
     ('routes.summary', 'summary_bp'),
     ('routes.health', 'health_bp'),
     ('routes.extensions', 'extensions_bp'),
+    ('routes.jobs', 'jobs_bp'),
 ]
 
 for module_path, bp_name in blueprints:
@@ -99,8 +103,15 @@ for module_path, bp_name in blueprints:
     except (ImportError, AttributeError) as e:
         logging.error(f"Failed to register {bp_name} from {module_path}: {e}")
 
-# Scheduler setup for daily reminders
-if notifications_enabled:
+# Pick up ingestion jobs that were queued or interrupted before the last restart
+try:
+    from ingestion_jobs import resume_pending_jobs
+    resume_pending_jobs()
+except Exception as e:
+    logging.error(f"Failed to resume ingestion jobs: {e}")
+
+# Scheduler setup for daily reminders (ingestion workers re-import this module; only the server schedules)
+if notifications_enabled and multiprocessing.parent_process() is None:
     scheduler = BackgroundScheduler()
     dhaka_tz = pytz.timezone("Asia/Dhaka")
     
@@ -3,4 +3,12 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
\ No newline at end of file
+PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
+
+# Directory for local on-disk state (caches, queues, indexes)
+LOCAL_DATA_DIR = os.getenv("RECALLO_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
+# Store chunk text in vector metadata so retrieval can skip the Supabase lookup.
+# Pinecone caps metadata at 40KB per vector; larger chunks are stored without text.
+VECTOR_METADATA_TEXT = os.getenv("VECTOR_METADATA_TEXT", "true").lower() in ("1", "true", "yes")
+VECTOR_METADATA_TEXT_MAX_BYTES = int(os.getenv("VECTOR_METADATA_TEXT_MAX_BYTES", 30000))
@@ -0,0 +1,101 @@
+"""
+Process-wide cache for large source texts fed to the LLM.
+
+Topic merged_content and the concatenated chunks of an uploaded file are
+read by quiz, flashcard and summary generation on every request. They are
+kept here once, in an LRU bounded by total characters, so repeat requests
+skip the download.
+
+The frontend deletes and edits topics directly in Supabase, so the
+invalidate_* hooks don't see every change. Entries therefore also expire
+after CONTENT_CACHE_TTL, and a cached topic is only served after a cheap
+check that the topic still exists.
+"""
+
+import os
+import logging
+
+from local_cache import LRUCache
+from ingestion_jobs import is_file_ingesting
+
+CONTENT_CACHE_MAX_CHARS = int(os.getenv("CONTENT_CACHE_MAX_CHARS", 64 * 1024 * 1024))
+CONTENT_CACHE_TTL = float(os.getenv("CONTENT_CACHE_TTL", 300))
+
+_content_cache = LRUCache(maxsize=CONTENT_CACHE_MAX_CHARS, ttl=CONTENT_CACHE_TTL,
+                          weigher=lambda value: len(value["content"]))
+
+
+def get_topic_content(supabase, topic_id):
+    """merged_content of a topic, or None if the topic does not exist."""
+    key = ("topic", topic_id)
+    cached = _content_cache.get(key)
+    if cached is not None:
+        exists = supabase.table("topics").select("topic_id").eq("topic_id", topic_id).limit(1).execute()
+        if exists.data:
+            return cached["content"]
+        invalidate_topic(topic_id)
+        return None
+
+    response = supabase.table("topics").select("merged_content").eq("topic_id", topic_id).limit(1).execute()
+    if not response.data:
+        return None
+    content = response.data[0].get("merged_content") or ""
+    _content_cache.set(key, {"content": content})
+    return content
+
+
+def get_file_content(supabase, file_uuid):
+    """
+    All chunks of an uploaded file joined into one text.
+
+    Returns {"first_id", "content"} or None when the file has no chunks yet.
+    Files still being ingested are read but not cached, since more chunks
+    are on the way.
+    """
+    key = ("file", file_uuid)
+    cached = _content_cache.get(key)
+    if cached is not None:
+        return cached
+
+    response = supabase.table("documents").select("id", "content").eq("file_uuid", file_uuid).execute()
+    if not response.data:
+        return None
+    value = {
+        "first_id": response.data[0]["id"],
+        "content": "\n\n".join(doc["content"] for doc in response.data)
+    }
+    try:
+        cacheable = not is_file_ingesting(file_uuid)
+    except Exception as e:
+        logging.warning(f"⚠️ Could not check ingestion status for file {file_uuid}: {e}")
+        cacheable = False
+    if cacheable:
+        _content_cache.set(key, value)
+    return value
+
+
+def get_document_content(supabase, document_id, user_id):
+    """Content of a single document row owned by user_id, or None."""
+    key = ("document", document_id, user_id)
+    cached = _content_cache.get(key)
+    if cached is not None:
+        return cached["content"]
+
+    response = supabase.table("documents").select("content").eq("id", document_id).eq("user_id", user_id).execute()
+    if not response.data:
+        return None
+    content = "\n\n".join(chunk["content"] for chunk in response.data)
+    _content_cache.set(key, {"content": content})
+    return content
+
+
+def invalidate_topic(topic_id):
+    _content_cache.pop(("topic", topic_id))
+
+
+def invalidate_file(file_uuid):
+    _content_cache.pop(("file", file_uuid))
+
+
+def invalidate_document(document_id, user_id):
+    _content_cache.pop(("document", document_id, user_id))
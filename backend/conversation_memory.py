@@ -0,0 +1,115 @@
+"""
+Per-conversation chat memory.
+
+chat_logs is the source of truth for a conversation's history, so any
+worker can serve any turn. Each worker keeps the last k turns of hot
+conversations in a bounded LRU, tagged with the created_at of the newest
+turn they include. Before a cached copy is used, the newest chat_logs
+timestamp is checked; if another worker has recorded a turn since, the
+history is reloaded.
+
+Every turn works on its own ConversationBufferWindowMemory built from that
+history, so nothing is locked while the LLM generates the reply.
+"""
+
+import os
+import logging
+import threading
+
+from langchain.memory import ConversationBufferWindowMemory
+
+from local_cache import LRUCache
+
+CHAT_MEMORY_TURNS = int(os.getenv("CHAT_MEMORY_TURNS", 10))
+CHAT_MEMORY_MAX_CONVERSATIONS = int(os.getenv("CHAT_MEMORY_MAX_CONVERSATIONS", 1000))
+CHAT_MEMORY_IDLE_SECONDS = float(os.getenv("CHAT_MEMORY_IDLE_SECONDS", 1800))
+
+
+class ConversationMemoryStore:
+    def __init__(self, supabase, k=CHAT_MEMORY_TURNS, max_conversations=CHAT_MEMORY_MAX_CONVERSATIONS,
+                 idle_seconds=CHAT_MEMORY_IDLE_SECONDS):
+        self.supabase = supabase
+        self.k = k
+        # conversation_id -> {"turns": [(user_message, response_message)], "latest": created_at}
+        self._histories = LRUCache(maxsize=max_conversations, ttl=idle_seconds)
+        # Only guards the read-modify-write in record(); never held across a network call
+        self._lock = threading.Lock()
+
+    def _latest_created_at(self, conversation_id):
+        response = self.supabase.table("chat_logs") \
+            .select("created_at") \
+            .eq("conversation_id", conversation_id) \
+            .order("created_at", desc=True) \
+            .limit(1) \
+            .execute()
+        return response.data[0]["created_at"] if response.data else None
+
+    def _hydrate(self, conversation_id):
+        response = self.supabase.table("chat_logs") \
+            .select("user_message, response_message, created_at") \
+            .eq("conversation_id", conversation_id) \
+            .order("created_at", desc=True) \
+            .limit(self.k) \
+            .execute()
+        rows = response.data or []
+        return {
+            "turns": [(row["user_message"], row["response_message"]) for row in reversed(rows)],
+            "latest": rows[0]["created_at"] if rows else None
+        }
+
+    def _build_memory(self, turns):
+        memory = ConversationBufferWindowMemory(k=self.k, return_messages=True)
+        for user_message, response_message in turns:
+            memory.save_context({"input": user_message}, {"output": response_message})
+        return memory
+
+    def load(self, conversation_id, is_new=False):
+        """
+        (memory, latest): a fresh memory holding the conversation's last k turns,
+        and the created_at of the newest of them.
+
+        is_new skips the chat_logs lookup for a conversation created by this
+        request. Changes to the memory are not kept; pass latest to record()
+        once the turn is saved.
+        """
+        if is_new:
+            return self._build_memory([]), None
+        try:
+            history = self._histories.get(conversation_id)
+            if history is None or history["latest"] != self._latest_created_at(conversation_id):
+                history = self._hydrate(conversation_id)
+                self._histories.set(conversation_id, history)
+            return self._build_memory(history["turns"]), history["latest"]
+        except Exception as e:
+            logging.warning(f"⚠️ Could not load chat history for conversation {conversation_id}: {e}")
+            return self._build_memory([]), None
+
+    def record(self, conversation_id, latest, user_message, response_message, created_at):
+        """
+        Add a turn that was just saved to chat_logs (created_at is its row's timestamp).
+
+        latest is what load() returned for the turn. If the cached history has
+        moved on since then it is dropped instead, and the next load() rebuilds it.
+        """
+        with self._lock:
+            history = self._histories.get(conversation_id) or {"turns": [], "latest": None}
+            if history["latest"] != latest or not created_at:
+                self._histories.pop(conversation_id)
+                return
+            turns = (history["turns"] + [(user_message, response_message)])[-self.k:]
+            self._histories.set(conversation_id, {"turns": turns, "latest": created_at})
+
+    def forget(self, conversation_id):
+        self._histories.pop(conversation_id)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_memory_store(supabase):
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ConversationMemoryStore(supabase)
+        return _store
@@ -0,0 +1,165 @@
+"""
+Shared extraction-and-chunking stage for uploaded documents.
+
+A PDF is parsed once per hash_file: its page text and the chunks for every
+granularity used by the app are stored locally, so /upload (retrieval
+chunks) and /quiz-question (topic chunks) reuse the same artifacts instead
+of each parsing and splitting the file on their own.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from itertools import islice
+
+from config import LOCAL_DATA_DIR
+from pdf_extraction import iter_pdf_pages, iter_text_chunks
+
+ARTIFACTS_DB_PATH = os.getenv("DOCUMENT_ARTIFACTS_DB", os.path.join(LOCAL_DATA_DIR, "document_artifacts.sqlite3"))
+ARTIFACT_TTL_DAYS = float(os.getenv("DOCUMENT_ARTIFACT_TTL_DAYS", 7))
+
+# granularity -> (chunk_size, chunk_overlap, page separator)
+CHUNK_GRANULARITIES = {
+    "retrieval": (500, 50, ""),  # /upload, /ask
+    "topic": (1000, 200, "\n"),  # /quiz-question topic clustering
+}
+
+_INSERT_BATCH = 200
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _connect():
+    os.makedirs(os.path.dirname(ARTIFACTS_DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(ARTIFACTS_DB_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(
+        "CREATE TABLE IF NOT EXISTS ingested_documents ("
+        " hash_file TEXT PRIMARY KEY, page_count INTEGER NOT NULL, created_at REAL NOT NULL);"
+        "CREATE TABLE IF NOT EXISTS document_pages ("
+        " hash_file TEXT NOT NULL, page_num INTEGER NOT NULL, text TEXT NOT NULL,"
+        " PRIMARY KEY (hash_file, page_num));"
+        "CREATE TABLE IF NOT EXISTS document_chunks ("
+        " hash_file TEXT NOT NULL, granularity TEXT NOT NULL, chunk_index INTEGER NOT NULL, content TEXT NOT NULL,"
+        " PRIMARY KEY (hash_file, granularity, chunk_index));"
+    )
+    return conn
+
+
+def _lock_for(file_hash):
+    with _locks_guard:
+        return _locks.setdefault(file_hash, threading.Lock())
+
+
+def _iter_stored_pages(conn, file_hash):
+    cursor = conn.execute(
+        "SELECT text FROM document_pages WHERE hash_file = ? ORDER BY page_num", (file_hash,)
+    )
+    for (text,) in cursor:
+        yield text
+
+
+def _insert_in_batches(conn, sql, rows):
+    # Commit per batch so a long extraction never holds the SQLite write lock for its whole run
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, _INSERT_BATCH))
+        if not batch:
+            return
+        conn.executemany(sql, batch)
+        conn.commit()
+
+
+def prune_document_artifacts(max_age_days=ARTIFACT_TTL_DAYS):
+    """Drop artifacts older than max_age_days."""
+    cutoff = time.time() - max_age_days * 86400
+    conn = _connect()
+    try:
+        stale = [row[0] for row in conn.execute(
+            "SELECT hash_file FROM ingested_documents WHERE created_at < ?", (cutoff,)
+        )]
+        for file_hash in stale:
+            conn.execute("DELETE FROM document_chunks WHERE hash_file = ?", (file_hash,))
+            conn.execute("DELETE FROM document_pages WHERE hash_file = ?", (file_hash,))
+            conn.execute("DELETE FROM ingested_documents WHERE hash_file = ?", (file_hash,))
+        conn.commit()
+        if stale:
+            logging.info(f"🧹 Pruned artifacts for {len(stale)} document(s)")
+    finally:
+        conn.close()
+
+
+def ensure_document_artifacts(file_path, file_hash):
+    """
+    Extract and chunk file_path once for file_hash.
+
+    Pages are streamed from the PDF into the store, then each granularity is
+    chunked by streaming the stored pages back, so memory stays flat.
+    Returns the number of pages.
+    """
+    with _lock_for(file_hash):
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT page_count FROM ingested_documents WHERE hash_file = ?", (file_hash,)
+            ).fetchone()
+            if row:
+                logging.info(f"♻️ Reusing extracted artifacts for {file_hash[:12]}")
+                return row[0]
+
+            # Same hash means same bytes, so rows left by an interrupted or concurrent
+            # run are identical and can simply be replaced
+            page_count = 0
+            def page_rows():
+                nonlocal page_count
+                for page_num, text in iter_pdf_pages(file_path):
+                    page_count += 1
+                    yield file_hash, page_num, text
+
+            _insert_in_batches(conn, "INSERT OR REPLACE INTO document_pages (hash_file, page_num, text) VALUES (?, ?, ?)", page_rows())
+
+            for granularity, (chunk_size, chunk_overlap, separator) in CHUNK_GRANULARITIES.items():
+                chunks = iter_text_chunks(
+                    _iter_stored_pages(conn, file_hash), chunk_size, chunk_overlap, separator=separator
+                )
+                _insert_in_batches(
+                    conn,
+                    "INSERT OR REPLACE INTO document_chunks (hash_file, granularity, chunk_index, content) VALUES (?, ?, ?, ?)",
+                    ((file_hash, granularity, i, chunk) for i, chunk in enumerate(chunks))
+                )
+
+            conn.execute(
+                "INSERT OR REPLACE INTO ingested_documents (hash_file, page_count, created_at) VALUES (?, ?, ?)",
+                (file_hash, page_count, time.time())
+            )
+            conn.commit()
+            logging.info(f"📚 Extracted {page_count} pages for {file_hash[:12]}")
+        finally:
+            conn.close()
+
+    prune_document_artifacts()
+    return page_count
+
+
+def iter_document_chunks(file_hash, granularity):
+    """Yield stored chunk texts for file_hash at the given granularity, in order."""
+    if granularity not in CHUNK_GRANULARITIES:
+        raise ValueError(f"Unknown chunk granularity: {granularity}")
+    conn = _connect()
+    try:
+        cursor = conn.execute(
+            "SELECT content FROM document_chunks WHERE hash_file = ? AND granularity = ? ORDER BY chunk_index",
+            (file_hash, granularity)
+        )
+        for (content,) in cursor:
+            yield content
+    finally:
+        conn.close()
+
+
+def iter_pdf_document_chunks(file_path, file_hash, granularity):
+    """Ensure file_path has been ingested and stream its chunks for granularity."""
+    ensure_document_artifacts(file_path, file_hash)
+    return iter_document_chunks(file_hash, granularity)
@@ -0,0 +1,12 @@
+-- Document chunk uniqueness for Recallo
+-- Ingestion upserts chunks on chunk_id so a retried batch insert can't
+-- duplicate rows when the first attempt landed but its response was lost.
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_documents_chunk_id
+ON public.documents USING btree (chunk_id);
+
+-- Backs the cleanup of partially ingested files
+CREATE INDEX IF NOT EXISTS idx_documents_file_uuid
+ON public.documents USING btree (file_uuid);
+
+COMMIT;
@@ -0,0 +1,184 @@
+"""
+Persistent outbox for transactional email.
+
+Request handlers call enqueue_email(), which only writes a row to a local
+SQLite queue, so SMTP latency and outages never reach the HTTP response. A
+daemon thread delivers due messages through Flask-Mail, retrying failures
+with exponential backoff; messages that keep failing are marked failed with
+the last error. Rows left mid-send by a crash are retried on the next start.
+"""
+
+import os
+import time
+import uuid
+import random
+import sqlite3
+import logging
+import threading
+import multiprocessing
+
+import mailer
+from config import LOCAL_DATA_DIR
+
+OUTBOX_DB_PATH = os.getenv("EMAIL_OUTBOX_DB", os.path.join(LOCAL_DATA_DIR, "email_outbox.sqlite3"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", 6))
+OUTBOX_BASE_DELAY = float(os.getenv("EMAIL_OUTBOX_BASE_DELAY", 30))
+OUTBOX_MAX_DELAY = float(os.getenv("EMAIL_OUTBOX_MAX_DELAY", 3600))
+OUTBOX_POLL_INTERVAL = float(os.getenv("EMAIL_OUTBOX_POLL_INTERVAL", 15))
+OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", 50))
+
+_wakeup = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _connect():
+    os.makedirs(os.path.dirname(OUTBOX_DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(OUTBOX_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS email_outbox ("
+        " email_id TEXT PRIMARY KEY,"
+        " recipient TEXT NOT NULL,"
+        " subject TEXT NOT NULL,"
+        " html TEXT,"
+        " body TEXT,"
+        " status TEXT NOT NULL,"
+        " attempts INTEGER NOT NULL DEFAULT 0,"
+        " next_attempt_at REAL NOT NULL,"
+        " last_error TEXT,"
+        " created_at REAL NOT NULL,"
+        " updated_at REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (status, next_attempt_at)")
+    return conn
+
+
+def enqueue_email(to, subject, html=None, body=None):
+    """Queue a message for delivery and return its id. Never contacts the SMTP server."""
+    email_id = str(uuid.uuid4())
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO email_outbox (email_id, recipient, subject, html, body, status, next_attempt_at, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, 'pending', ?, ?, ?)",
+            (email_id, to, subject, html, body, now, now, now)
+        )
+    _wakeup.set()
+    logging.info(f"📨 Queued email {email_id} to {to}")
+    return email_id
+
+
+def get_email(email_id):
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM email_outbox WHERE email_id = ?", (email_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def _claim_due(limit):
+    """Atomically move up to limit due messages from pending to sending."""
+    now = time.time()
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT * FROM email_outbox WHERE status = 'pending' AND next_attempt_at <= ?"
+            " ORDER BY next_attempt_at LIMIT ?",
+            (now, limit)
+        ).fetchall()
+        claimed = []
+        for row in rows:
+            updated = conn.execute(
+                "UPDATE email_outbox SET status = 'sending', updated_at = ? WHERE email_id = ? AND status = 'pending'",
+                (now, row["email_id"])
+            )
+            if updated.rowcount == 1:
+                claimed.append(dict(row))
+    return claimed
+
+
+def _mark_sent(row):
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE email_outbox SET status = 'sent', attempts = ?, last_error = NULL, updated_at = ? WHERE email_id = ?",
+            (row["attempts"] + 1, time.time(), row["email_id"])
+        )
+
+
+def _mark_failed(row, error):
+    attempts = row["attempts"] + 1
+    now = time.time()
+    if attempts >= OUTBOX_MAX_ATTEMPTS:
+        status, next_attempt_at = "failed", now
+        logging.error(f"❌ Giving up on email {row['email_id']} to {row['recipient']} after {attempts} attempts: {error}")
+    else:
+        delay = min(OUTBOX_MAX_DELAY, OUTBOX_BASE_DELAY * (2 ** (attempts - 1)))
+        status, next_attempt_at = "pending", now + delay * random.uniform(0.8, 1.2)
+        logging.warning(f"⚠️ Email {row['email_id']} failed (attempt {attempts}), retrying in {delay:.0f}s: {error}")
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE email_outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ?"
+            " WHERE email_id = ?",
+            (status, attempts, next_attempt_at, str(error), now, row["email_id"])
+        )
+
+
+def deliver_due_emails(limit=OUTBOX_BATCH_SIZE):
+    """Send every due message once over pooled SMTP connections; returns how many were delivered."""
+    rows = _claim_due(limit)
+    if not rows:
+        return 0
+    if mailer._app is None:
+        errors = [RuntimeError("Flask-Mail has not been initialised")] * len(rows)
+    else:
+        errors = mailer.send_emails([
+            {"to": row["recipient"], "subject": row["subject"], "html": row["html"], "body": row["body"]}
+            for row in rows
+        ])
+
+    delivered = 0
+    for row, error in zip(rows, errors):
+        if error is not None:
+            _mark_failed(row, error)
+            continue
+        _mark_sent(row)
+        delivered += 1
+    if delivered:
+        logging.info(f"✅ Delivered {delivered} queued email(s)")
+    return delivered
+
+
+def _requeue_interrupted():
+    with _connect() as conn:
+        requeued = conn.execute(
+            "UPDATE email_outbox SET status = 'pending', updated_at = ? WHERE status = 'sending'",
+            (time.time(),)
+        ).rowcount
+    if requeued:
+        logging.info(f"🔁 Re-queued {requeued} email(s) interrupted mid-send")
+
+
+def _run_worker():
+    while True:
+        try:
+            # Keep going without waiting while full batches are coming back
+            while deliver_due_emails() == OUTBOX_BATCH_SIZE:
+                pass
+        except Exception as e:
+            logging.error(f"❌ Email outbox delivery loop failed: {e}")
+        _wakeup.wait(timeout=OUTBOX_POLL_INTERVAL)
+        _wakeup.clear()
+
+
+def start_outbox_worker():
+    """Start the delivery thread once per server process."""
+    global _worker
+    # Ingestion worker processes import this module too; only the server delivers
+    if multiprocessing.parent_process() is not None:
+        return
+    with _worker_lock:
+        if _worker is not None and _worker.is_alive():
+            return
+        _requeue_interrupted()
+        _worker = threading.Thread(target=_run_worker, name="email-outbox", daemon=True)
+        _worker.start()
+    logging.info("📬 Email outbox worker started")
@@ -4,10 +4,10 @@ Handles all email sending functionality to avoid circular imports
 """
 
 import os
-import logging
-from flask_mail import Mail, Message
+from flask_mail import Mail
 from flask import Flask
 from dotenv import load_dotenv
+from mail_transport import get_transport
 
 # Load environment variables
 load_dotenv()
@@ -25,16 +25,18 @@ email_app.config['MAIL_DEFAULT_SENDER'] = os.environ.get("MAIL_USERNAME")
 mail = Mail(email_app)
 
 def send_email(to, subject, body):
-    """Use Flask-Mail to send the message."""
-    try:
-        with email_app.app_context():
-            msg = Message(subject, recipients=[to])
-            msg.body = body
-            mail.send(msg)
-            return True
-    except Exception as e:
-        logging.error(f"Mail send failed: {e}")
-        return False
+    """Send the message over a pooled SMTP connection."""
+    return get_transport(email_app, mail).send(to, subject, body=body)
+
+def send_emails(emails, on_batch=None):
+    """
+    Send many plain-text emails, reusing pooled SMTP connections.
+
+    emails is a list of {"to", "subject", "body"} dicts; returns None for each
+    email that was sent, otherwise the error. on_batch is passed through to
+    SMTPTransport.send_many().
+    """
+    return get_transport(email_app, mail).send_many(emails, on_batch=on_batch)
 
 def send_exam_result_email(user_email, user_name, topic_title, score):
     """Send a detailed and friendly result email after quiz submission."""
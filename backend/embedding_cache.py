@@ -0,0 +1,162 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+from config import LOCAL_DATA_DIR
+from local_cache import LRUCache
+
+EMBEDDING_MODEL = "models/embedding-001"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(LOCAL_DATA_DIR, "embedding_cache.sqlite3"))
+EMBEDDING_LRU_SIZE = int(os.getenv("EMBEDDING_LRU_SIZE", 4096))
+
+
+def normalize_text(text):
+    """Collapse whitespace so trivially re-flowed chunks hash to the same key."""
+    return " ".join(text.split())
+
+
+def embedding_key(model, text, task="document"):
+    """
+    Content address for an embedding.
+
+    The task is part of the key because Gemini embeds queries and documents
+    with different task types, so their vectors are not interchangeable.
+    """
+    payload = f"{model}\x00{task}\x00{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding store with an in-process LRU in front of it."""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, lru_size=EMBEDDING_LRU_SIZE):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.lru = LRUCache(lru_size)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys):
+        """Return {key: vector} for every key found in the LRU or on disk."""
+        found = {}
+        missing = []
+        for key in keys:
+            vector = self.lru.get(key)
+            if vector is not None:
+                found[key] = vector
+            else:
+                missing.append(key)
+
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(missing), 500):
+            part = missing[i:i + 500]
+            placeholders = ",".join("?" * len(part))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+            for key, blob in rows:
+                vector = array("f", blob).tolist()
+                self.lru.set(key, vector)
+                found[key] = vector
+        return found
+
+    def put_many(self, model, items):
+        """Store an iterable of (key, vector) pairs."""
+        now = time.time()
+        rows = []
+        for key, vector in items:
+            self.lru.set(key, list(vector))
+            rows.append((key, model, array("f", vector).tobytes(), now))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, created_at) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+
+class CachedEmbeddings:
+    """
+    Drop-in wrapper around a LangChain embeddings object that only calls the
+    remote model for texts it has not embedded before.
+    """
+
+    def __init__(self, embeddings, model=EMBEDDING_MODEL, cache=None):
+        self.embeddings = embeddings
+        self.model = model
+        self._cache = cache
+
+    @property
+    def cache(self):
+        # Resolved per call so a wrapper created before a fork uses the worker's own connection
+        return self._cache or get_embedding_cache()
+
+    def embed_documents(self, texts):
+        keys = [embedding_key(self.model, text) for text in texts]
+        found = self.cache.get_many(set(keys))
+
+        # Embed each distinct missing text once, even if it repeats within the batch
+        to_embed = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in to_embed:
+                to_embed[key] = text
+
+        if to_embed:
+            new_vectors = self.embeddings.embed_documents(list(to_embed.values()))
+            fresh = dict(zip(to_embed.keys(), new_vectors))
+            self.cache.put_many(self.model, fresh.items())
+            found.update(fresh)
+
+        logging.debug(f"Embedding cache: {len(texts) - len(to_embed)}/{len(texts)} hits")
+        return [found[key] for key in keys]
+
+    def embed_query(self, text):
+        key = embedding_key(self.model, text, task="query")
+        found = self.cache.get_many([key])
+        if key in found:
+            return found[key]
+
+        vector = self.embeddings.embed_query(text)
+        self.cache.put_many(self.model, [(key, vector)])
+        return vector
+
+
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """Process-wide EmbeddingCache, created on first use."""
+    global _cache, _cache_pid
+    with _cache_lock:
+        # SQLite connections must not be used across fork(); forked ingestion workers open their own
+        if _cache is None or _cache_pid != os.getpid():
+            _cache = EmbeddingCache()
+            _cache_pid = os.getpid()
+        return _cache
+
+
+def get_cached_embeddings(gemini_api_key, model=EMBEDDING_MODEL):
+    """Gemini embeddings wrapped with the shared content-addressed cache."""
+    return CachedEmbeddings(
+        GoogleGenerativeAIEmbeddings(model=model, google_api_key=gemini_api_key),
+        model=model
+    )
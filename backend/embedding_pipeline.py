@@ -0,0 +1,77 @@
+import os
+import logging
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from retry_utils import call_with_retry
+
+# Tunables for the embedding stage (overridable from the environment)
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 32))
+EMBED_MAX_WORKERS = int(os.getenv("EMBED_MAX_WORKERS", 4))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", 3))
+
+
+def iter_batches(texts, batch_size):
+    """Yield (start_index, batch) tuples of at most batch_size items from any iterable."""
+    iterator = iter(texts)
+    start = 0
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield start, batch
+        start += len(batch)
+
+
+def embed_in_batches(embedding_fn, texts, batch_size=EMBED_BATCH_SIZE, max_workers=EMBED_MAX_WORKERS,
+                     max_retries=EMBED_MAX_RETRIES):
+    """
+    Embed texts in bounded batches on a thread pool.
+
+    Batches are yielded as soon as they finish (not necessarily in input order),
+    so callers can persist each batch while the rest are still being embedded.
+    At most 2 * max_workers batches are in flight, which keeps memory bounded
+    even when texts is a lazy generator.
+
+    Args:
+        embedding_fn: Object exposing embed_documents(list[str])
+        texts: Iterable of chunk strings
+        batch_size: Maximum number of texts per embed_documents call
+        max_workers: Number of concurrent embedding requests
+        max_retries: Attempts per batch before the error is propagated
+
+    Yields:
+        (start_index, batch_texts, batch_embeddings)
+    """
+    def embed_batch(start, batch):
+        embeddings = call_with_retry(
+            embedding_fn.embed_documents, batch,
+            attempts=max_retries,
+            label=f"embed batch @{start}"
+        )
+        if len(embeddings) != len(batch):
+            raise ValueError(f"Embedding batch @{start} returned {len(embeddings)} vectors for {len(batch)} texts.")
+        return start, batch, embeddings
+
+    batches = iter_batches(texts, batch_size)
+    max_in_flight = max_workers * 2
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embed") as executor:
+        pending = set()
+        try:
+            for start, batch in batches:
+                pending.add(executor.submit(embed_batch, start, batch))
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            # Don't start queued batches if the consumer stopped early or a batch failed
+            for future in pending:
+                future.cancel()
+            logging.debug("Embedding pool drained.")
@@ -1,3 +1,9 @@
+import os
+
+from config import VECTOR_METADATA_TEXT, VECTOR_METADATA_TEXT_MAX_BYTES
+from local_cache import LRUCache
+
+
 def fetch_text_from_supabase(supabase, identifier_value, user_id, identifier_type="file_uuid"):
     """
     Fetch content from Supabase using either file_uuid or chunk_id.
@@ -29,3 +35,76 @@ def fetch_text_from_supabase(supabase, identifier_value, user_id, identifier_typ
     except Exception as e:
         print(f"Error fetching from Supabase: {e}")
         return None
+
+
+# Chunk text never changes once ingested, so it can be kept across requests
+_chunk_text_cache = LRUCache(maxsize=int(os.getenv("CHUNK_TEXT_CACHE_SIZE", 5000)))
+
+
+def _fetch_chunk_texts(supabase, chunk_ids, user_id):
+    """{chunk_id: content} for the given chunks, from the cache or one Supabase query."""
+    texts = {}
+    missing = []
+    for chunk_id in chunk_ids:
+        cached = _chunk_text_cache.get((user_id, chunk_id))
+        if cached is not None:
+            texts[chunk_id] = cached
+        else:
+            missing.append(chunk_id)
+
+    if missing:
+        try:
+            response = (
+                supabase.table("documents")
+                .select("chunk_id, content")
+                .in_("chunk_id", missing)
+                .eq("user_id", user_id)
+                .execute()
+            )
+            for row in response.data or []:
+                texts[row["chunk_id"]] = row["content"]
+                _chunk_text_cache.set((user_id, row["chunk_id"]), row["content"])
+        except Exception as e:
+            print(f"Error fetching chunks from Supabase: {e}")
+    return texts
+
+
+def chunk_text_metadata(content, chunk_index):
+    """
+    Vector metadata carrying a chunk's text and position.
+
+    The text is left out when VECTOR_METADATA_TEXT is off or the chunk is
+    larger than VECTOR_METADATA_TEXT_MAX_BYTES; retrieval then reads it from
+    Supabase instead.
+    """
+    metadata = {"chunk_index": chunk_index}
+    if VECTOR_METADATA_TEXT and len(content.encode("utf-8")) <= VECTOR_METADATA_TEXT_MAX_BYTES:
+        metadata["text"] = content
+    return metadata
+
+
+def texts_from_matches(supabase, matches, user_id):
+    """
+    Content of vector search matches in ranking order.
+
+    Text stored in the match metadata is used directly; only matches without
+    it (oversized chunks, or vectors ingested before text was stored) are
+    hydrated from Supabase, in one bulk query.
+    """
+    ordered_ids = []
+    seen = set()
+    texts = {}
+    for match in matches:
+        chunk_id = match["id"]
+        if chunk_id in seen:
+            continue
+        seen.add(chunk_id)
+        ordered_ids.append(chunk_id)
+        text = (match.get("metadata") or {}).get("text")
+        if text is not None:
+            texts[chunk_id] = text
+
+    missing = [chunk_id for chunk_id in ordered_ids if chunk_id not in texts]
+    if missing:
+        texts.update(_fetch_chunk_texts(supabase, missing, user_id))
+    return [texts[chunk_id] for chunk_id in ordered_ids if chunk_id in texts]
@@ -0,0 +1,334 @@
+"""
+Background ingestion jobs for Recallo.
+
+Uploads are persisted to disk and recorded in a local SQLite queue, then
+processed by a process pool so the HTTP request can return immediately.
+Jobs that were queued or interrupted survive a restart and are picked up
+again by resume_pending_jobs().
+"""
+
+import os
+import json
+import uuid
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import LOCAL_DATA_DIR
+
+JOBS_DB_PATH = os.getenv("INGESTION_JOBS_DB", os.path.join(LOCAL_DATA_DIR, "ingestion_jobs.sqlite3"))
+# Kept small: every worker runs its own PDF-extraction pool and embedding threads
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", 2))
+
+# Ordered stages a job reports while it runs
+STAGES = ("queued", "extract", "chunk", "embed", "cluster", "title", "persist", "done")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _connect():
+    os.makedirs(os.path.dirname(JOBS_DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(JOBS_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS ingestion_jobs ("
+        " job_id TEXT PRIMARY KEY,"
+        " kind TEXT NOT NULL,"
+        " user_id TEXT,"
+        " file_hash TEXT,"
+        " payload TEXT NOT NULL,"
+        " status TEXT NOT NULL,"
+        " stage TEXT NOT NULL,"
+        " detail TEXT,"
+        " result TEXT,"
+        " error TEXT,"
+        " worker_pid INTEGER,"
+        " created_at TEXT NOT NULL,"
+        " updated_at TEXT NOT NULL)"
+    )
+    return conn
+
+
+def _now():
+    return datetime.now().isoformat()
+
+
+def _row_to_job(row):
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def create_job(kind, payload, user_id=None, file_hash=None):
+    """Insert a queued job and return its id."""
+    job_id = str(uuid.uuid4())
+    now = _now()
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO ingestion_jobs (job_id, kind, user_id, file_hash, payload, status, stage, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, 'queued', 'queued', ?, ?)",
+            (job_id, kind, user_id, file_hash, json.dumps(payload), now, now)
+        )
+    return job_id
+
+
+def get_job(job_id):
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM ingestion_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return _row_to_job(row) if row else None
+
+
+def find_active_job(kind, user_id, file_hash):
+    """Return a queued/running job for the same user and file, if any."""
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT * FROM ingestion_jobs WHERE kind = ? AND user_id = ? AND file_hash = ?"
+            " AND status IN ('queued', 'running') ORDER BY created_at DESC LIMIT 1",
+            (kind, user_id, file_hash)
+        ).fetchone()
+    return _row_to_job(row) if row else None
+
+
+def is_file_ingesting(file_uuid):
+    """True while a document job for this uploaded file is still queued or running."""
+    with _connect() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM ingestion_jobs WHERE kind = 'document' AND status IN ('queued', 'running')"
+            " AND json_extract(payload, '$.file_uuid') = ? LIMIT 1",
+            (file_uuid,)
+        ).fetchone()
+    return row is not None
+
+
+def update_job(job_id, **fields):
+    if "result" in fields and fields["result"] is not None:
+        fields["result"] = json.dumps(fields["result"])
+    fields["updated_at"] = _now()
+    assignments = ", ".join(f"{key} = ?" for key in fields)
+    with _connect() as conn:
+        conn.execute(f"UPDATE ingestion_jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+
+def _claim_job(job_id):
+    """Atomically move a queued job to running. Returns False if someone else has it."""
+    with _connect() as conn:
+        cursor = conn.execute(
+            "UPDATE ingestion_jobs SET status = 'running', worker_pid = ?, updated_at = ?"
+            " WHERE job_id = ? AND status = 'queued'",
+            (os.getpid(), _now(), job_id)
+        )
+        return cursor.rowcount == 1
+
+
+def _run_document_job(payload, supabase, progress):
+    from upload_pdf import process_pdf
+
+    success, chunk_count, file_name, file_uuid = process_pdf(
+        payload["file_path"], supabase, os.getenv("GEMINI_API_KEY"), payload["user_id"], payload["file_hash"],
+        file_uuid=payload.get("file_uuid"), file_name=payload.get("file_name"), progress=progress
+    )
+    if not success:
+        raise RuntimeError(chunk_count)
+    return {
+        "message": f"PDF processed. {chunk_count} chunks saved from '{file_name}'.",
+        "chunk_count": chunk_count,
+        "file_name": file_name,
+        "file_uuid": file_uuid
+    }
+
+
+def _run_quiz_job(payload, supabase, progress):
+    from process_pdf_for_quiz import process_pdf_for_quiz
+
+    result = process_pdf_for_quiz(
+        payload["file_path"], os.getenv("GEMINI_API_KEY"), payload["user_id"], supabase, payload["file_hash"],
+        progress=progress
+    )
+    if not result or result.get("status") != "success":
+        raise RuntimeError((result or {}).get("message", "Failed to process PDF."))
+    return {"message": result["message"]}
+
+
+JOB_HANDLERS = {
+    "document": _run_document_job,
+    "quiz": _run_quiz_job,
+}
+
+
+def run_job(job_id):
+    """Entry point executed inside a worker process."""
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    if not _claim_job(job_id):
+        logging.info(f"Job {job_id} already claimed, skipping")
+        return
+
+    job = get_job(job_id)
+    payload = job["payload"]
+
+    def progress(stage, detail=None):
+        update_job(job_id, stage=stage, detail=detail)
+        logging.info(f"⏳ Job {job_id}: {stage}{f' ({detail})' if detail else ''}")
+
+    try:
+        supabase_url = os.getenv("SUPABASE_URL")
+        if not supabase_url:
+            raise RuntimeError("SUPABASE_URL is not set")
+        supabase = create_client(supabase_url, os.getenv("SUPABASE_KEY"))
+        result = JOB_HANDLERS[job["kind"]](payload, supabase, progress)
+        update_job(job_id, status="done", stage="done", detail=None, result=result)
+        logging.info(f"✅ Job {job_id} finished")
+    except Exception as e:
+        logging.error(f"🚫 Job {job_id} failed: {e}")
+        update_job(job_id, status="failed", error=str(e))
+    finally:
+        file_path = payload.get("file_path")
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def _init_worker():
+    """Split the Gemini budget across workers so the pool as a whole stays within LLM_REQUESTS_PER_MINUTE."""
+    from llm_throttle import LLM_REQUESTS_PER_MINUTE, LLM_MAX_CONCURRENCY, configure_default_limiter
+
+    requests_per_minute = LLM_REQUESTS_PER_MINUTE
+    if requests_per_minute > 0:
+        requests_per_minute = max(1, requests_per_minute // INGESTION_WORKERS)
+    configure_default_limiter(requests_per_minute, max(1, LLM_MAX_CONCURRENCY // INGESTION_WORKERS))
+
+
+def _get_executor():
+    global _executor
+    rebuilt = False
+    with _executor_lock:
+        # A worker that dies (e.g. killed for running out of memory) breaks the whole pool; start a fresh one
+        if _executor is not None and getattr(_executor, "_broken", False):
+            logging.warning("⚠️ Ingestion worker pool broke, starting a new one")
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+            rebuilt = True
+        if _executor is None:
+            # Never fork the web process: its outbox, scheduler and pool threads may hold locks
+            # (logging, SQLite, HTTP clients) that a forked child would inherit locked forever.
+            # forkserver forks workers from a clean single-threaded server; Windows only has spawn.
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["ingestion_jobs"])
+            else:
+                context = multiprocessing.get_context("spawn")
+            _executor = ProcessPoolExecutor(
+                max_workers=INGESTION_WORKERS,
+                mp_context=context,
+                initializer=_init_worker
+            )
+        executor = _executor
+    if rebuilt:
+        # The broken pool took all of its workers down with it, so everything it held runs again
+        _requeue_jobs(requeue_running=True)
+    return executor
+
+
+def _on_job_done(future):
+    if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+        # Rebuild straight away so the interrupted job doesn't wait for the next upload
+        try:
+            _get_executor()
+        except Exception as e:
+            logging.error(f"❌ Could not restart ingestion workers: {e}")
+
+
+def _submit(job_id):
+    _get_executor().submit(run_job, job_id).add_done_callback(_on_job_done)
+
+
+def submit_job(kind, payload, user_id=None, file_hash=None):
+    """Persist a job and hand it to the worker pool. Returns the job id."""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job_id = create_job(kind, payload, user_id=user_id, file_hash=file_hash)
+    try:
+        _submit(job_id)
+    except Exception as e:
+        # Otherwise the queued row makes find_active_job report the file as in progress until a restart
+        update_job(job_id, status="failed", error=f"Could not start processing: {e}")
+        raise
+    logging.info(f"📥 Queued {kind} job {job_id}")
+    return job_id
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def _requeue_jobs(requeue_running=False):
+    """
+    Re-submit queued jobs and running jobs whose worker is gone.
+
+    requeue_running also re-submits running jobs whose worker pid still
+    exists, for when the pool that owned them has been torn down.
+    """
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT job_id, status, worker_pid FROM ingestion_jobs WHERE status IN ('queued', 'running')"
+        ).fetchall()
+
+    resumed = 0
+    for row in rows:
+        if row["status"] == "running":
+            if not requeue_running and _pid_alive(row["worker_pid"]):
+                continue
+            update_job(row["job_id"], status="queued", stage="queued", worker_pid=None)
+        try:
+            # A job that is already queued in the pool is skipped by _claim_job, so resubmitting is safe
+            _submit(row["job_id"])
+        except Exception as e:
+            logging.error(f"❌ Could not resubmit ingestion job {row['job_id']}: {e}")
+            update_job(row["job_id"], status="failed", error=f"Could not restart processing: {e}")
+            continue
+        resumed += 1
+
+    if resumed:
+        logging.info(f"🔁 Resumed {resumed} pending ingestion job(s)")
+    return resumed
+
+
+def resume_pending_jobs():
+    """Re-submit jobs left queued, or running in a worker that no longer exists."""
+    if multiprocessing.parent_process() is not None:
+        # Spawned workers re-import app.py; only the web process owns the queue
+        return 0
+    return _requeue_jobs()
+
+
+def public_job_view(job):
+    """Job fields that are safe to return to the client."""
+    return {
+        "job_id": job["job_id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "stage_index": STAGES.index(job["stage"]) if job["stage"] in STAGES else None,
+        "stages": list(STAGES),
+        "detail": job["detail"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
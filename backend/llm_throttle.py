@@ -0,0 +1,97 @@
+import os
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager
+
+from retry_utils import call_with_retry
+
+# Gemini requests allowed per minute across all threads in this process
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", 60))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+
+
+class RateLimiter:
+    """Spaces calls at least 60 / requests_per_minute seconds apart and caps concurrency."""
+
+    def __init__(self, requests_per_minute=LLM_REQUESTS_PER_MINUTE, max_concurrency=LLM_MAX_CONCURRENCY):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+        self._concurrency = threading.BoundedSemaphore(max_concurrency)
+
+    def _wait_for_slot(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    @contextmanager
+    def slot(self):
+        """Hold one concurrency slot, entered no sooner than the rate allows."""
+        with self._concurrency:
+            self._wait_for_slot()
+            yield
+
+    def call(self, fn, *args, **kwargs):
+        with self.slot():
+            return fn(*args, **kwargs)
+
+
+def is_rate_limit_error(error):
+    """Best-effort detection of Gemini quota / 429 errors across client versions."""
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in ("429", "resourceexhausted", "resource exhausted", "rate limit", "quota"))
+
+
+_default_limiter = RateLimiter()
+
+
+def configure_default_limiter(requests_per_minute=LLM_REQUESTS_PER_MINUTE, max_concurrency=LLM_MAX_CONCURRENCY):
+    """Replace this process's shared limiter, e.g. to give a worker process its share of the budget."""
+    global _default_limiter
+    _default_limiter = RateLimiter(requests_per_minute, max_concurrency)
+
+
+def throttled_call(fn, *args, limiter=None, attempts=4, label=None, **kwargs):
+    """Run an LLM call through the shared rate limiter, backing off on rate-limit errors."""
+    limiter = limiter or _default_limiter
+    return call_with_retry(
+        limiter.call, fn, *args,
+        attempts=attempts,
+        base_delay=2.0,
+        should_retry=is_rate_limit_error,
+        label=label or getattr(fn, "__name__", "llm call"),
+        **kwargs
+    )
+
+
+def throttled_stream(fn, *args, limiter=None, attempts=4, label=None, **kwargs):
+    """
+    Streaming counterpart of throttled_call: yields the chunks of fn(*args, **kwargs)
+    while holding a limiter slot.
+
+    Rate-limit errors are retried with backoff only until the first chunk
+    arrives; after that the caller has seen partial output, so they propagate.
+    Close the generator when abandoning it early so the slot is released.
+    """
+    limiter = limiter or _default_limiter
+    name = label or getattr(fn, "__name__", "llm stream")
+    for attempt in range(1, attempts + 1):
+        started = False
+        try:
+            with limiter.slot():
+                for chunk in fn(*args, **kwargs):
+                    started = True
+                    yield chunk
+            return
+        except Exception as e:
+            if started or not is_rate_limit_error(e) or attempt == attempts:
+                raise
+            delay = min(30.0, 2.0 * (2 ** (attempt - 1)))
+            delay += random.uniform(0, delay / 2)
+            logging.warning(f"⚠️ {name} failed (attempt {attempt}/{attempts}): {e}. Retrying in {delay:.1f}s")
+            time.sleep(delay)
@@ -0,0 +1,83 @@
+import time
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Small thread-safe in-process LRU cache.
+
+    With ttl (seconds), entries also expire that long after they were set.
+    With a weigher, maxsize bounds the summed weigher(value) of all entries
+    (e.g. characters of cached text) instead of the number of entries.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, weigher=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.weigher = weigher
+        self._data = OrderedDict()
+        self._expires = {}
+        self._weights = {}
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def _remove(self, key):
+        del self._data[key]
+        self._expires.pop(key, None)
+        self._total -= self._weights.pop(key, 1)
+
+    def _expired(self, key):
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._remove(key)
+            return True
+        return False
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING or self._expired(key):
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        weight = self.weigher(value) if self.weigher else 1
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if weight > self.maxsize:
+                return
+            self._data[key] = value
+            self._weights[key] = weight
+            self._total += weight
+            if self.ttl is not None:
+                self._expires[key] = time.monotonic() + self.ttl
+            while self._total > self.maxsize:
+                self._remove(next(iter(self._data)))
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data[key]
+            self._remove(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+            self._weights.clear()
+            self._total = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data and not self._expired(key)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
@@ -0,0 +1,171 @@
+"""
+Pooled SMTP transport on top of Flask-Mail.
+
+Flask-Mail's mail.send() opens, authenticates and closes an SMTP session for
+every message. SMTPTransport keeps a few authenticated mail.connect()
+sessions open and sends through them, so a batch of reminders costs one TLS
+handshake per pooled connection instead of one per email. A session that
+has sat idle too long is replaced, and a send that fails on a dropped
+connection is retried once on a fresh one.
+"""
+
+import os
+import time
+import queue
+import logging
+import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask_mail import Message
+
+MAIL_POOL_SIZE = int(os.getenv("MAIL_POOL_SIZE", 3))
+MAIL_POOL_IDLE_SECONDS = float(os.getenv("MAIL_POOL_IDLE_SECONDS", 60))
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", 50))
+
+
+def is_connection_error(error):
+    """True when the SMTP session itself is unusable, as opposed to e.g. a refused recipient."""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError,
+                          smtplib.SMTPHeloError, smtplib.SMTPAuthenticationError)):
+        return True
+    # SMTPException subclasses OSError, so only plain socket errors count here
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class SMTPTransport:
+    def __init__(self, app, mail, size=MAIL_POOL_SIZE, idle_timeout=MAIL_POOL_IDLE_SECONDS):
+        self.app = app
+        self.mail = mail
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _open(self):
+        connection = self.mail.connect()
+        connection.__enter__()  # connects and logs in
+        return connection
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.__exit__(None, None, None)
+        except Exception:
+            pass
+
+    def _checkout(self):
+        while True:
+            try:
+                connection, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open()
+            if time.monotonic() - last_used < self.idle_timeout:
+                return connection
+            self._close(connection)
+
+    def _checkin(self, connection):
+        self._idle.put((connection, time.monotonic()))
+
+    def _send_one(self, connection, message):
+        """Send on connection, reconnecting once if the session dropped. Returns the connection to keep using."""
+        try:
+            connection.send(message)
+            return connection
+        except Exception as e:
+            if not is_connection_error(e):
+                raise
+            logging.warning(f"⚠️ SMTP connection lost ({e}), reconnecting")
+            self._close(connection)
+        connection = self._open()
+        try:
+            connection.send(message)
+        except Exception:
+            self._close(connection)
+            raise
+        return connection
+
+    def send_batch(self, emails):
+        """
+        Send emails over a single pooled connection.
+
+        emails is a list of dicts with "to", "subject" and "html" and/or
+        "body". Returns one entry per email: None if it was sent, otherwise
+        the exception that stopped it.
+        """
+        results = []
+        with self._slots, self.app.app_context():
+            connection = None
+            try:
+                connection = self._checkout()
+                for email in emails:
+                    try:
+                        message = Message(subject=email["subject"], recipients=[email["to"]],
+                                          html=email.get("html"), body=email.get("body"))
+                        connection = self._send_one(connection, message)
+                        results.append(None)
+                    except Exception as e:
+                        logging.error(f"❌ Failed to send email to {email['to']}: {e}")
+                        results.append(e)
+                        if is_connection_error(e):
+                            # _send_one already closed the dead session
+                            connection = None
+                            break
+            except Exception as e:
+                logging.error(f"❌ Could not open SMTP connection: {e}")
+                connection = None
+                results.append(e)
+            finally:
+                if connection is not None:
+                    self._checkin(connection)
+            # Anything not attempted shares the error that stopped the batch
+            if len(results) < len(emails):
+                results.extend([results[-1]] * (len(emails) - len(results)))
+        return results
+
+    def send_many(self, emails, batch_size=MAIL_BATCH_SIZE, on_batch=None):
+        """
+        Split emails into batches and send them over all pooled connections in parallel.
+
+        on_batch(start, results), if given, is called as soon as each batch
+        finishes, with the batch's offset into emails and its send_batch()
+        results, so callers can record what was sent without waiting for the
+        rest.
+        """
+        def send(start):
+            results = self.send_batch(emails[start:start + batch_size])
+            if on_batch is not None:
+                on_batch(start, results)
+            return results
+
+        starts = list(range(0, len(emails), batch_size))
+        if len(starts) <= 1:
+            return send(0) if emails else []
+        with ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="smtp") as executor:
+            return [result for batch in executor.map(send, starts) for result in batch]
+
+    def send(self, to, subject, html=None, body=None):
+        """Send one email; returns True on success."""
+        return self.send_batch([{"to": to, "subject": subject, "html": html, "body": body}])[0] is None
+
+    def close(self):
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(connection)
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(app, mail):
+    """The shared transport for a Flask app's Mail instance."""
+    with _transports_lock:
+        transport = _transports.get(id(app))
+        if transport is None or transport.app is not app:
+            transport = SMTPTransport(app, mail)
+            _transports[id(app)] = transport
+        return transport
@@ -1,5 +1,6 @@
-from flask_mail import Mail, Message
+from flask_mail import Mail
 import threading
+from mail_transport import get_transport
 
 mail = Mail()
 _app = None  # Global reference to Flask app
@@ -12,13 +13,17 @@ def init_mail(app):
 
 def send_email(to, subject, html):
     try:
-        msg = Message(subject=subject, recipients=[to], html=html)
-        mail.send(msg)
-        print("✅ Email sent successfully.")
-        return True
+        if get_transport(_app, mail).send(to, subject, html=html):
+            print("✅ Email sent successfully.")
+            return True
+        print("❌ Failed to send email.")
     except Exception as e:
         print(f"❌ Failed to send email: {e}")
-        return False
+    return False
+
+def send_emails(emails):
+    """Send many emails over pooled SMTP connections; returns None or the error for each."""
+    return get_transport(_app, mail).send_many(emails)
 
 def send_email_async(to, subject, html):
     def send_with_context():
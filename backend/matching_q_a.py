@@ -6,7 +6,9 @@ from dotenv import load_dotenv
 from datetime import datetime, timedelta
 from supabase import create_client
 import joblib
-from mailer import send_email
+from email_outbox import enqueue_email
+from quiz_history import invalidate_wrong_questions
+from notification_settings import is_email_enabled
 
 # Initialize Supabase client (make sure these env variables are set)
 load_dotenv()
@@ -27,20 +29,36 @@ except Exception as e:
 def generate_uuid():
     return str(uuid.uuid4())
 
-def evaluate_and_save_quiz(user_id, topic_id, submitted_answers, email_id=None):
-    import json
+def _is_missing_function_error(error):
+    """True when PostgREST reports that an RPC function is not deployed."""
+    text = str(error)
+    return "PGRST202" in text or "Could not find the function" in text
+
+
+def _submit_quiz_attempt(user_id, topic_id, submitted_answers):
+    """Score and persist a submission in one transaction via the submit_quiz_attempt RPC."""
+    response = supabase.rpc("submit_quiz_attempt", {
+        "p_user_id": user_id,
+        "p_topic_id": topic_id,
+        "p_answers": [
+            {"question_id": ans["question_id"], "selected_answer": ans["selected_answer"]}
+            for ans in submitted_answers
+        ]
+    }).execute()
+    if not response.data:
+        raise Exception("submit_quiz_attempt returned no result")
+    return response.data
 
-    # If email_id is not provided, fetch user's email from database
-    if not email_id:
-        try:
-            user_resp = supabase.table("users").select("email").eq("user_id", user_id).single().execute()
-            if user_resp.data and user_resp.data.get("email"):
-                email_id = user_resp.data["email"]
-                logging.info(f"📧 Auto-fetched user email: {email_id}")
-            else:
-                logging.warning(f"⚠️ No email found for user {user_id}")
-        except Exception as e:
-            logging.error(f"❌ Error fetching user email: {e}")
+
+def _submit_quiz_attempt_legacy(user_id, topic_id, submitted_answers):
+    """Row-by-row fallback for databases without the submit_quiz_attempt function."""
+    email_id = None
+    try:
+        user_resp = supabase.table("users").select("email").eq("user_id", user_id).single().execute()
+        if user_resp.data and user_resp.data.get("email"):
+            email_id = user_resp.data["email"]
+    except Exception as e:
+        logging.error(f"❌ Error fetching user email: {e}")
 
     # Extract question IDs
     question_ids = [ans["question_id"] for ans in submitted_answers]
@@ -77,9 +95,7 @@ def evaluate_and_save_quiz(user_id, topic_id, submitted_answers, email_id=None):
         selected = ans["selected_answer"]
         correct = correct_answers_map.get(qid)
 
-        option_texts = option_text_map.get(qid, {})  # ✅ Make sure this is above both .get() calls
-
-        correct_text = option_texts.get(correct, "N/A")
+        option_texts = option_text_map.get(qid, {})
         selected_text = option_texts.get(selected, "N/A")
 
         is_correct = (selected == correct)
@@ -130,25 +146,25 @@ def evaluate_and_save_quiz(user_id, topic_id, submitted_answers, email_id=None):
     progress_data = progress_res.data[0] if progress_res.data and len(progress_res.data) > 0 else None
 
     if not progress_data:
+        progress = {"last_score": score, "attempts_count": 1, "mastered": score >= 7}
         insert_progress_res = supabase.table("user_topic_progress").insert({
             "user_id": user_id,
             "topic_id": topic_id,
-            "last_score": score,
-            "attempts_count": 1,
-            "mastered": score >= 7,
+            **progress,
             "last_attempt": datetime.now().isoformat()
         }).execute()
 
         if not insert_progress_res or not insert_progress_res.data:
             raise Exception("Failed to insert user topic progress into Supabase")
     else:
-        attempts_count = progress_data.get("attempts_count", 0) + 1
-        mastered = progress_data.get("mastered", False) or (score >= 7)
+        progress = {
+            "last_score": score,
+            "attempts_count": progress_data.get("attempts_count", 0) + 1,
+            "mastered": progress_data.get("mastered", False) or (score >= 7)
+        }
 
         update_res = supabase.table("user_topic_progress").update({
-            "last_score": score,
-            "attempts_count": attempts_count,
-            "mastered": mastered,
+            **progress,
             "last_attempt": datetime.now().isoformat()
         }).eq("user_id", user_id).eq("topic_id", topic_id).execute()
 
@@ -160,8 +176,47 @@ def evaluate_and_save_quiz(user_id, topic_id, submitted_answers, email_id=None):
     status_update = supabase.table("topics").update({
         "topic_status": new_status
     }).eq("topic_id", topic_id).execute()
-    
-    
+
+    topic_title = None
+    if not status_update or not status_update.data:
+        logging.warning(f"⚠️ Failed to update topic_status to '{new_status}' for topic {topic_id}")
+    else:
+        topic_title = status_update.data[0].get("title")
+
+    return {
+        "attempt_id": attempt_id,
+        "score": score,
+        "total_questions": total_questions,
+        "correct_answers": correct_count,
+        "progress": progress,
+        "topic_title": topic_title,
+        "email": email_id
+    }
+
+
+def evaluate_and_save_quiz(user_id, topic_id, submitted_answers, email_id=None):
+    try:
+        result = _submit_quiz_attempt(user_id, topic_id, submitted_answers)
+    except Exception as e:
+        if not _is_missing_function_error(e):
+            raise
+        logging.warning("⚠️ submit_quiz_attempt RPC not deployed, saving the quiz row by row")
+        result = _submit_quiz_attempt_legacy(user_id, topic_id, submitted_answers)
+
+    # The next quiz on this topic should reuse the mistakes from this attempt
+    invalidate_wrong_questions(user_id, topic_id)
+
+    score = float(result["score"])
+    total_questions = result["total_questions"]
+    correct_count = result["correct_answers"]
+
+    # If email_id is not provided, use the user's email from the database
+    if not email_id and result.get("email"):
+        email_id = result["email"]
+        logging.info(f"📧 Auto-fetched user email: {email_id}")
+    elif not email_id:
+        logging.warning(f"⚠️ No email found for user {user_id}")
+
     # Simple next review date logic (no model prediction to avoid database schema issues)
     if score >= 8:
         predicted_days = 7  # Review in 1 week for good scores
@@ -174,40 +229,22 @@ def evaluate_and_save_quiz(user_id, topic_id, submitted_answers, email_id=None):
     logging.info(f"✅ Next review date set: {next_review_date.date()}")
 
 
-    if not status_update or not status_update.data:
-        logging.warning(f"⚠️ Failed to update topic_status to '{new_status}' for topic {topic_id}")
-        
-     # Fetch the topic title from the topics table
-    topic_lookup = supabase.table("topics").select("title").eq("topic_id", topic_id).execute()
-
-    topic_title = "your selected topic"
-    if topic_lookup.data and len(topic_lookup.data) > 0:
-        topic_title = topic_lookup.data[0].get("title", "your selected topic")
+    topic_title = result.get("topic_title") or "your selected topic"
     mistake_count = total_questions - correct_count
 
     
     if email_id:
         # Check if user has email notifications enabled
         try:
-            # Import here to avoid circular imports
-            import requests
-            notification_resp = requests.get(f"http://localhost:5000/api/notification-settings/{user_id}")
-
-            if notification_resp.status_code == 200:
-                settings = notification_resp.json()
-                email_notifications_enabled = settings.get("global_settings", {}).get("email_notifications_enabled", True)
-
-                if not email_notifications_enabled:
-                    logging.info(f"📧 Email notifications disabled for user {user_id}, skipping email")
-                    return {
-                        "score": score,
-                        "total_questions": total_questions,
-                        "correct_answers": correct_count
-                    }
-                else:
-                    logging.info(f"📧 Email notifications enabled for user {user_id}, sending email")
-            else:
-                logging.warning(f"⚠️ Could not check notification settings for user {user_id}, sending email anyway")
+            if not is_email_enabled(user_id):
+                logging.info(f"📧 Email notifications disabled for user {user_id}, skipping email")
+                return {
+                    "score": score,
+                    "total_questions": total_questions,
+                    "correct_answers": correct_count,
+                    "progress": result.get("progress")
+                }
+            logging.info(f"📧 Email notifications enabled for user {user_id}, sending email")
         except Exception as e:
             logging.error(f"❌ Error checking notification settings: {e}, sending email anyway")
 
@@ -263,12 +300,17 @@ def evaluate_and_save_quiz(user_id, topic_id, submitted_answers, email_id=None):
         </div>
         """
 
-        send_email(email_id, subject, html_body)
+        # Delivered by the outbox worker so SMTP never delays the submission response
+        try:
+            enqueue_email(email_id, subject, html=html_body)
+        except Exception as e:
+            logging.error(f"❌ Failed to queue quiz result email for user {user_id}: {e}")
 
     return {
         "score": score,
         "total_questions": total_questions,
-        "correct_answers": correct_count
+        "correct_answers": correct_count,
+        "progress": result.get("progress")
     }
     
     
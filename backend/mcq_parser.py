@@ -0,0 +1,137 @@
+"""
+Parser for the "Question N: / A) .. D) / Answer: / Explanation:" MCQ format.
+
+Every line of the completion is classified by one precompiled pattern in a
+single pass, and each finished block is checked against the question schema
+(non-empty text, exactly four options A-D, an answer letter that names one of
+them). Blocks that fail the check are reported instead of silently vanishing,
+so callers can ask the model for just the missing questions.
+"""
+
+import re
+import logging
+
+OPTION_LETTERS = ("A", "B", "C", "D")
+
+_LINE = re.compile(
+    r"""^[ \t>*_#]*(?:
+        Question[ \t]*(?P<number>\d+)[ \t]*[:.][ \t*_]*(?P<question>.*)
+      | (?P<letter>[A-D])\)[ \t]*(?P<option>.*)
+      | Answer[ \t*_]*:[ \t*_]*\[?(?P<answer>[A-D])\]?[ \t]*(?:[-:)][ \t]*(?P<answer_text>.*))?
+      | Explanation[ \t*_]*:[ \t*_]*(?P<explanation>.*)
+    )$""",
+    re.IGNORECASE | re.VERBOSE
+)
+_QUESTION_HEADER = re.compile(r"^[ \t>*_#]*Question[ \t]*\d+[ \t]*[:.]", re.IGNORECASE | re.MULTILINE)
+
+DEFAULT_EXPLANATION = "No explanation provided."
+
+
+def _new_block(number, question):
+    return {"number": number, "question": [question] if question else [], "options": [], "answer": None,
+            "answer_text": "", "explanation": [], "field": "question"}
+
+
+def _tokenize(text):
+    """Group the lines of text into raw question blocks in one pass."""
+    blocks = []
+    block = None
+    for line in text.splitlines():
+        match = _LINE.match(line)
+        if match is None:
+            # Continuation of whichever field is open (multi-line stems, code, wrapped explanations)
+            if block is not None and line.strip():
+                field = block["field"]
+                if field == "question":
+                    block["question"].append(line.rstrip())
+                elif field == "option":
+                    letter, option = block["options"][-1]
+                    block["options"][-1] = (letter, f"{option}\n{line.rstrip()}")
+                elif field == "explanation":
+                    block["explanation"].append(line.strip())
+            continue
+
+        if match.group("number") is not None:
+            block = _new_block(int(match.group("number")), match.group("question").strip())
+            blocks.append(block)
+        elif block is None:
+            continue
+        elif match.group("letter") is not None:
+            block["options"].append((match.group("letter").upper(), match.group("option").strip()))
+            block["field"] = "option"
+        elif match.group("answer") is not None:
+            block["answer"] = match.group("answer").upper()
+            block["answer_text"] = (match.group("answer_text") or "").strip()
+            block["field"] = "answer"
+        else:
+            block["explanation"].append(match.group("explanation").strip())
+            block["field"] = "explanation"
+    return blocks
+
+
+def validate_block(block):
+    """Return the reason a raw block breaks the question schema, or None if it is valid."""
+    if not " ".join(block["question"]).strip():
+        return "missing question text"
+    letters = tuple(letter for letter, _ in block["options"])
+    if letters != OPTION_LETTERS:
+        return f"expected options A-D, got {', '.join(letters) or 'none'}"
+    if any(not option for _, option in block["options"]):
+        return "empty option"
+    if block["answer"] not in OPTION_LETTERS:
+        return "missing answer letter"
+    return None
+
+
+def _to_question(block):
+    options = [option for _, option in block["options"]]
+    answer = block["answer"]
+    return {
+        "question_text": "\n".join(block["question"]).strip(),
+        "options": options,
+        "correct_answer": answer,
+        "correct_text": block["answer_text"] or options[OPTION_LETTERS.index(answer)],
+        "explanation": " ".join(block["explanation"]).strip() or DEFAULT_EXPLANATION,
+    }
+
+
+def parse_mcqs(text):
+    """
+    Parse a completion into questions.
+
+    Returns (questions, rejected) where rejected is a list of
+    (question_number, reason) for blocks that failed validation.
+    """
+    questions, rejected = [], []
+    for block in _tokenize(text or ""):
+        reason = validate_block(block)
+        if reason:
+            rejected.append((block["number"], reason))
+        else:
+            questions.append(_to_question(block))
+    if rejected:
+        logging.warning(f"⚠️ Rejected {len(rejected)} malformed MCQ block(s): {rejected}")
+    return questions, rejected
+
+
+def parse_mcq_response(text):
+    """Valid questions only, in the order they appear."""
+    return parse_mcqs(text)[0]
+
+
+def iter_streamed_questions(token_stream):
+    """
+    Parse questions out of a token stream as soon as each block is complete.
+
+    A block is finished once the next question's header has arrived, so at
+    most one block is buffered beyond what has been yielded.
+    """
+    buffer = ""
+    for token in token_stream:
+        buffer += token
+        headers = list(_QUESTION_HEADER.finditer(buffer))
+        if len(headers) >= 2:
+            complete_end = headers[-1].start()
+            yield from parse_mcq_response(buffer[:complete_end])
+            buffer = buffer[complete_end:]
+    yield from parse_mcq_response(buffer)
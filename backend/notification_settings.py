@@ -0,0 +1,116 @@
+"""
+In-process notification preferences.
+
+Quiz submission, the reminder job and the settings API all read preferences
+through this module rather than over HTTP. Settings saved through the API
+are kept in memory (as before); users without saved settings fall back to
+their user_notification_settings row, cached for a short TTL, and then to
+the defaults.
+"""
+
+import os
+import copy
+import logging
+import threading
+
+from supabase import create_client
+
+from local_cache import LRUCache
+
+SUPABASE_URL = os.getenv("SUPABASE_URL", "https://bhrwvazkvsebdxstdcow.supabase.co/")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+NOTIFICATION_SETTINGS_CACHE_TTL = float(os.getenv("NOTIFICATION_SETTINGS_CACHE_TTL", 300))
+
+DEFAULT_SETTINGS = {
+    "global_settings": {
+        "email_notifications_enabled": True,
+        "daily_reminders_enabled": True
+    },
+    "topic_settings": {}
+}
+
+# Temporary in-memory storage for settings saved through the API (until tables are created)
+_saved_settings = {}
+_saved_lock = threading.Lock()
+_stored_settings_cache = LRUCache(maxsize=4096, ttl=NOTIFICATION_SETTINGS_CACHE_TTL)
+
+
+STORED_SETTINGS_COLUMNS = "user_id, email_notifications_enabled, daily_reminders_enabled"
+
+
+def _settings_from_row(row):
+    settings = copy.deepcopy(DEFAULT_SETTINGS)
+    for key in settings["global_settings"]:
+        if row and row.get(key) is not None:
+            settings["global_settings"][key] = row[key]
+    return settings
+
+
+def _load_stored_settings(user_id):
+    cached = _stored_settings_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    row = None
+    try:
+        response = supabase.table("user_notification_settings") \
+            .select(STORED_SETTINGS_COLUMNS) \
+            .eq("user_id", user_id) \
+            .limit(1) \
+            .execute()
+        row = response.data[0] if response.data else None
+    except Exception as e:
+        logging.warning(f"⚠️ Could not load notification settings for user {user_id}, using defaults: {e}")
+
+    settings = _settings_from_row(row)
+    _stored_settings_cache.set(user_id, settings)
+    return settings
+
+
+def get_settings(user_id):
+    """A user's {"global_settings", "topic_settings"} preferences."""
+    with _saved_lock:
+        saved = _saved_settings.get(user_id)
+    return copy.deepcopy(saved if saved is not None else _load_stored_settings(user_id))
+
+
+def get_settings_many(user_ids, stored_rows):
+    """
+    Settings for many users at once, from user_notification_settings rows the
+    caller already fetched in bulk (users without a row get the defaults).
+    """
+    rows = {row["user_id"]: row for row in stored_rows}
+    with _saved_lock:
+        saved = {user_id: _saved_settings[user_id] for user_id in user_ids if user_id in _saved_settings}
+    settings = {}
+    for user_id in user_ids:
+        if user_id in saved:
+            settings[user_id] = copy.deepcopy(saved[user_id])
+        else:
+            settings[user_id] = _settings_from_row(rows.get(user_id))
+            _stored_settings_cache.set(user_id, copy.deepcopy(settings[user_id]))
+    return settings
+
+
+def update_settings(user_id, data):
+    settings = {
+        "global_settings": data.get("global_settings", copy.deepcopy(DEFAULT_SETTINGS["global_settings"])),
+        "topic_settings": data.get("topic_settings", {})
+    }
+    with _saved_lock:
+        _saved_settings[user_id] = settings
+    return settings
+
+
+def is_email_enabled(user_id):
+    return get_settings(user_id)["global_settings"].get("email_notifications_enabled", True)
+
+
+def is_daily_reminders_enabled(user_id):
+    return get_settings(user_id)["global_settings"].get("daily_reminders_enabled", True)
+
+
+def is_topic_enabled(user_id, topic_id):
+    return get_settings(user_id)["topic_settings"].get(topic_id) is not False
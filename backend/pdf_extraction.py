@@ -0,0 +1,100 @@
+import os
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from PyPDF2 import PdfReader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+# PDFs with more pages than this are extracted on a process pool
+PARALLEL_PAGE_THRESHOLD = int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", 40))
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 10))
+EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", os.cpu_count() or 2))
+
+
+def _extract_page_range(file_path, start, stop):
+    """Extract pages [start, stop) in a worker process."""
+    reader = PdfReader(file_path)
+    return [(page_num, reader.pages[page_num].extract_text() or "") for page_num in range(start, stop)]
+
+
+def _iter_pages_sequential(reader):
+    for page_num, page in enumerate(reader.pages):
+        yield page_num, page.extract_text() or ""
+
+
+def _iter_pages_parallel(file_path, page_count, max_workers):
+    ranges = [(start, min(start + PAGES_PER_TASK, page_count)) for start in range(0, page_count, PAGES_PER_TASK)]
+    max_in_flight = max_workers * 2
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # Keep a bounded window of ranges in flight and yield them in page order
+        pending = deque()
+        for start, stop in ranges:
+            pending.append(executor.submit(_extract_page_range, file_path, start, stop))
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def iter_pdf_pages(file_path, parallel_threshold=PARALLEL_PAGE_THRESHOLD, max_workers=EXTRACTION_WORKERS):
+    """
+    Lazily yield (page_num, text) for every page of a PDF, in order.
+
+    Large PDFs are split into page ranges that are extracted across a
+    process pool; small ones are read page by page in this process.
+    """
+    reader = PdfReader(file_path)
+    page_count = len(reader.pages)
+
+    if page_count > parallel_threshold and max_workers > 1:
+        logging.info(f"📄 Extracting {page_count} pages on {max_workers} workers")
+        pages = _iter_pages_parallel(file_path, page_count, max_workers)
+    else:
+        pages = _iter_pages_sequential(reader)
+
+    for page_num, text in pages:
+        # Check for empty or unreadable pages and log a warning
+        if not text.strip():
+            logging.warning(f"Page {page_num} in the PDF is empty or contains invalid text.")
+        yield page_num, text
+
+
+def iter_text_chunks(texts, chunk_size, chunk_overlap, separator="\n", window_chunks=8):
+    """
+    Streaming version of RecursiveCharacterTextSplitter.split_text over many texts.
+
+    Texts are joined with separator into a rolling buffer of roughly
+    window_chunks * chunk_size characters. Every full chunk except the last
+    is emitted and the buffer restarts at the last chunk, so overlap between
+    consecutive chunks is preserved without ever holding the whole document.
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    window = chunk_size * window_chunks
+    buffer = ""
+
+    for text in texts:
+        buffer = buffer + separator + text if buffer else text
+        if len(buffer) < window:
+            continue
+
+        chunks = splitter.split_text(buffer)
+        if len(chunks) < 2:
+            continue
+        yield from chunks[:-1]
+
+        tail = chunks[-1]
+        tail_start = buffer.rfind(tail)
+        buffer = buffer[tail_start:] if tail_start != -1 else tail
+
+    if buffer.strip():
+        yield from splitter.split_text(buffer)
+
+
+def iter_pdf_chunks(file_path, chunk_size, chunk_overlap, separator="\n"):
+    """Extract and chunk a PDF as a single lazy stream."""
+    return iter_text_chunks(
+        (text for _, text in iter_pdf_pages(file_path)),
+        chunk_size, chunk_overlap, separator=separator
+    )
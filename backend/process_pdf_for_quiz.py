@@ -1,62 +1,45 @@
 import os
 import uuid
 import logging
-import re
-from difflib import SequenceMatcher
 
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
-from sklearn.cluster import AgglomerativeClustering
+
+from embedding_cache import get_cached_embeddings
+from document_ingestion import iter_pdf_document_chunks
+from topic_clustering import cluster_embeddings, cluster_centroids, group_chunks
+from topic_dedup import load_user_topic_index, centroid_to_row
+from topic_generation import generate_topic_texts
 
 
 def generate_unique_id():
     return str(uuid.uuid4())
 
-def normalize_title(title):
-    title = title.lower()
-    title = re.sub(r"[^a-z0-9\s]", "", title)  # remove punctuation
-    title = " ".join(title.split())  # normalize whitespace
-    return title
-
-def is_similar(a, b, threshold=0.8):
-    return SequenceMatcher(None, a, b).ratio() > threshold
-
-def process_pdf_for_quiz(file_path, gemini_api_key, user_id, supabase, file_hash):
+def process_pdf_for_quiz(file_path, gemini_api_key, user_id, supabase, file_hash, progress=None):
     try:
         file_name_full = os.path.basename(file_path)
         file_name = file_name_full.split("_", 1)[-1] if "_" in file_name_full else file_name_full
         file_uuid = generate_unique_id()
 
-        # 1. Load PDF
-        loader = PyPDFLoader(file_path)
-        pages = loader.load()
-        text = "\n".join([page.page_content for page in pages])
-        if not text.strip():
-            raise ValueError("Empty or unreadable PDF.")
-
-        # 2. Chunk splitting
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        chunks = splitter.split_text(text)
+        # 1-2. Extract and chunk once per file hash (shared with the /upload path)
+        if progress:
+            progress("extract")
+        chunks = list(iter_pdf_document_chunks(file_path, file_hash, "topic"))
         if not chunks:
-            raise ValueError("No chunks generated.")
+            raise ValueError("Empty or unreadable PDF.")
 
         # 3. Generate embeddings
-        embed_model = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            google_api_key=gemini_api_key
-        )
+        if progress:
+            progress("embed", f"{len(chunks)} chunks")
+        embed_model = get_cached_embeddings(gemini_api_key)
         embeddings = embed_model.embed_documents(chunks)
 
         # 4. Clustering
-        clustering = AgglomerativeClustering(n_clusters=None, distance_threshold=0.6)
-        clustering.fit(embeddings)
-
-        clustered_chunks = {}
-        for idx, label in enumerate(clustering.labels_):
-            clustered_chunks.setdefault(label, []).append(chunks[idx])
+        if progress:
+            progress("cluster", f"{len(chunks)} chunks")
+        labels, cluster_stats = cluster_embeddings(embeddings)
+        clustered_chunks = group_chunks(chunks, labels)
 
         # 5. Setup LLM & Prompts
         llm = ChatGoogleGenerativeAI(
@@ -85,31 +68,49 @@ def process_pdf_for_quiz(file_path, gemini_api_key, user_id, supabase, file_hash
                 "Summary:"
             )
         )
+        # Combined prompt: one call returns both fields, the two prompts above are the fallback
+        topic_prompt = PromptTemplate(
+            input_variables=["content"],
+            template=(
+                "From the following content, generate a topic title and a short summary.\n"
+                "Constraints:\n"
+                "- title: exactly ONE topic title, maximum 5 words, no lists or explanations\n"
+                "- summary: the key points in 1-2 lines, focusing on what this topic is mainly about and what it covers\n"
+                "Respond with ONLY a JSON object, no markdown:\n"
+                '{{"title": "...", "summary": "..."}}\n\n'
+                "Content:\n{content}\n"
+            )
+        )
 
         title_chain = LLMChain(llm=llm, prompt=title_prompt)
         summary_chain = LLMChain(llm=llm, prompt=summary_prompt)
+        topic_chain = LLMChain(llm=llm, prompt=topic_prompt)
 
         # 6. Generate and save topics
+        if progress:
+            progress("title", f"{cluster_stats['clusters']} clusters ({cluster_stats['strategy']}, {cluster_stats['seconds']}s)")
+        topics = generate_topic_texts(clustered_chunks, title_chain, summary_chain, topic_chain=topic_chain)
+
+        # De-duplicate in cluster order once every title is known: by centroid or title
+        # within this file, and by centroid against the topics the user already has
+        centroids = cluster_centroids(embeddings, labels)
+        dedup_index = load_user_topic_index(supabase, user_id)
         rows = []
-        existing_titles = []
-
-        for cluster_label, chunk_list in clustered_chunks.items():
-            merged_content = "\n".join(chunk_list)
+        duplicates = 0
 
-            # Generate title
-            topic_title = title_chain.run(content=merged_content).strip().replace("*", "").replace("-", "")
+        for topic in topics:
+            topic_title = topic["title"]
             if not topic_title:
                 continue
 
-            normalized_title = normalize_title(topic_title)
-            if any(is_similar(normalized_title, normalize_title(t)) for t in existing_titles):
-                logging.info(f"Skipping similar topic: {topic_title}")
+            centroid = centroids.get(topic["label"])
+            duplicate_of = dedup_index.find_duplicate(topic_title, centroid)
+            if duplicate_of:
+                logging.info(f"Skipping similar topic: {topic_title} (matches '{duplicate_of}')")
+                duplicates += 1
                 continue
 
-            existing_titles.append(topic_title)
-
-            # Generate summary
-            topic_summary = summary_chain.run(content=merged_content).strip()
+            dedup_index.add(topic_title, centroid)
 
             # Add row
             rows.append({
@@ -117,16 +118,26 @@ def process_pdf_for_quiz(file_path, gemini_api_key, user_id, supabase, file_hash
                 "user_id": user_id,
                 "document_for_quiz_id": file_uuid,
                 "title": topic_title,
-                "merged_content": merged_content,
-                "topic_summary": topic_summary,
+                "merged_content": topic["merged_content"],
+                "topic_summary": topic["summary"],
                 "topic_status": "Ongoing",
                 "file_name": file_name,
-                "hash_file": file_hash
+                "hash_file": file_hash,
+                "centroid": centroid_to_row(centroid)
             })
 
             logging.info(f"Generated topic: {topic_title}")
 
         # 7. Insert into Supabase
+        if progress:
+            progress("persist", f"{len(rows)} topics")
+        if not rows:
+            if not duplicates:
+                raise ValueError("No topics could be generated from this file.")
+            # Every topic in this file duplicates one the user already has
+            os.remove(file_path)
+            return {"status": "success", "message": "No new topics found in this file."}
+
         logging.info("Inserting topics into Supabase...")
         response = supabase.from_("topics").insert(rows).execute()
         logging.info(f"Insert response: {response}")
@@ -0,0 +1,149 @@
+"""
+Pre-generated MCQ pool per (topic, difficulty).
+
+/generate-questions draws ready questions from quiz_question_pool with one
+RPC call (see question_pool.sql). When a draw leaves the pool below the
+low-water mark, a background worker generates enough questions to bring it
+back up to the target size.
+"""
+
+import os
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_throttle import throttled_call
+from mcq_parser import parse_mcq_response
+from content_cache import get_topic_content
+
+POOL_TARGET_SIZE = int(os.getenv("QUESTION_POOL_TARGET", 20))
+POOL_LOW_WATER = int(os.getenv("QUESTION_POOL_LOW_WATER", 10))
+POOL_REFILL_WORKERS = int(os.getenv("QUESTION_POOL_WORKERS", 2))
+
+_refill_executor = ThreadPoolExecutor(max_workers=POOL_REFILL_WORKERS, thread_name_prefix="question-pool")
+_inflight = set()
+_inflight_lock = threading.Lock()
+
+
+def _pool_row_to_question(row):
+    options_map = json.loads(row["answer_option_text"])
+    return {
+        "question_text": row["prompt"],
+        "options": [options_map[letter] for letter in ("A", "B", "C", "D")],
+        "correct_answer": row["answer"],
+        "correct_text": options_map.get(row["answer"], ""),
+        "explanation": row.get("explanation") or "No explanation provided."
+    }
+
+
+def _question_to_pool_row(topic_id, difficulty, q):
+    return {
+        "topic_id": topic_id,
+        "difficulty": difficulty,
+        "prompt": q["question_text"],
+        "answer": q["correct_answer"],
+        "answer_option_text": json.dumps(dict(zip(("A", "B", "C", "D"), q["options"]))),
+        "explanation": q.get("explanation")
+    }
+
+
+def draw_questions(supabase, topic_id, difficulty, count):
+    """
+    Take up to count unseen questions out of the pool.
+
+    Pool rows are deleted as they are drawn, so a question is never served
+    twice; callers hand them back with return_questions() if the quiz isn't
+    saved. Schedules a refill when the pool falls below the low-water mark.
+    Returns a list of parsed question dicts (possibly empty).
+    """
+    if count <= 0:
+        return []
+    try:
+        response = supabase.rpc("claim_pool_questions", {
+            "p_topic_id": topic_id,
+            "p_difficulty": difficulty,
+            "p_limit": count
+        }).execute()
+        result = response.data or {}
+    except Exception as e:
+        logging.warning(f"⚠️ Question pool unavailable for topic {topic_id}: {e}")
+        return []
+
+    questions = [_pool_row_to_question(row) for row in result.get("questions") or []]
+    remaining = result.get("remaining", 0)
+    logging.info(f"🎯 Drew {len(questions)}/{count} pooled questions for topic {topic_id} ({remaining} left)")
+
+    if remaining < POOL_LOW_WATER:
+        request_refill(topic_id, difficulty)
+    return questions
+
+
+def return_questions(supabase, topic_id, difficulty, questions):
+    """
+    Put drawn questions back into the pool.
+
+    Used when the quiz they were drawn for could not be saved, so the draw
+    doesn't use them up.
+    """
+    if not questions:
+        return
+    try:
+        supabase.table("quiz_question_pool") \
+            .insert([_question_to_pool_row(topic_id, difficulty, q) for q in questions]) \
+            .execute()
+        logging.info(f"↩️ Returned {len(questions)} unused questions to the pool for topic {topic_id}")
+    except Exception as e:
+        logging.error(f"❌ Could not return {len(questions)} questions to the pool for topic {topic_id}: {e}")
+
+
+def request_refill(topic_id, difficulty):
+    """Queue a background refill unless one is already pending for this topic/difficulty."""
+    key = (topic_id, difficulty)
+    with _inflight_lock:
+        if key in _inflight:
+            return
+        _inflight.add(key)
+    _refill_executor.submit(_refill, topic_id, difficulty)
+
+
+def _refill(topic_id, difficulty):
+    # Imported here because QA_ANSWER draws from this module
+    from QA_ANSWER import supabase, get_llm_chain
+
+    try:
+        count_res = supabase.table("quiz_question_pool") \
+            .select("pool_id", count="exact") \
+            .eq("topic_id", topic_id) \
+            .eq("difficulty", difficulty) \
+            .limit(1) \
+            .execute()
+        missing = POOL_TARGET_SIZE - (count_res.count or 0)
+        if missing <= 0:
+            return
+
+        merged_content = get_topic_content(supabase, topic_id)
+        if merged_content is None:
+            logging.warning(f"⚠️ Topic {topic_id} not found, skipping pool refill")
+            return
+
+        chain = get_llm_chain(os.getenv("GEMINI_API_KEY"))
+        llm_response = throttled_call(
+            chain.run,
+            content=merged_content, difficulty=difficulty, num_questions=missing,
+            label=f"pool refill {topic_id}"
+        )
+        questions = parse_mcq_response(llm_response)[:missing]
+        if not questions:
+            logging.warning(f"⚠️ Pool refill for topic {topic_id} produced no valid questions")
+            return
+
+        supabase.table("quiz_question_pool") \
+            .insert([_question_to_pool_row(topic_id, difficulty, q) for q in questions]) \
+            .execute()
+        logging.info(f"♻️ Refilled question pool for topic {topic_id} ({difficulty}) with {len(questions)} questions")
+    except Exception as e:
+        logging.error(f"❌ Question pool refill failed for topic {topic_id}: {e}")
+    finally:
+        with _inflight_lock:
+            _inflight.discard((topic_id, difficulty))
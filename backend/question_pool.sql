@@ -0,0 +1,54 @@
+-- Pre-generated question pool for Recallo quizzes
+-- Questions are generated ahead of demand per (topic, difficulty) and consumed
+-- by /generate-questions, so a quiz can be served without waiting on the LLM.
+
+-- 1. Pool table (rows are deleted as soon as they are served)
+CREATE TABLE IF NOT EXISTS public.quiz_question_pool (
+    pool_id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    topic_id uuid NOT NULL REFERENCES public.topics(topic_id) ON DELETE CASCADE,
+    difficulty text NOT NULL,
+    prompt text NOT NULL,
+    answer text NOT NULL,
+    answer_option_text text NOT NULL,
+    explanation text,
+    created_at timestamp with time zone DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_quiz_question_pool_topic_difficulty
+ON public.quiz_question_pool USING btree (topic_id, difficulty, created_at);
+
+-- 2. Atomically take up to p_limit questions out of the pool.
+-- SKIP LOCKED lets concurrent quiz requests draw disjoint questions.
+-- Returns {"questions": [...], "remaining": <rows left for this topic/difficulty>}
+CREATE OR REPLACE FUNCTION public.claim_pool_questions(p_topic_id uuid, p_difficulty text, p_limit integer)
+RETURNS json
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    claimed json;
+    remaining integer;
+BEGIN
+    WITH picked AS (
+        SELECT pool_id
+        FROM public.quiz_question_pool
+        WHERE topic_id = p_topic_id AND difficulty = p_difficulty
+        ORDER BY created_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    ), taken AS (
+        DELETE FROM public.quiz_question_pool p
+        USING picked
+        WHERE p.pool_id = picked.pool_id
+        RETURNING p.prompt, p.answer, p.answer_option_text, p.explanation
+    )
+    SELECT coalesce(json_agg(taken), '[]'::json) INTO claimed FROM taken;
+
+    SELECT count(*) INTO remaining
+    FROM public.quiz_question_pool
+    WHERE topic_id = p_topic_id AND difficulty = p_difficulty;
+
+    RETURN json_build_object('questions', claimed, 'remaining', remaining);
+END;
+$$;
+
+COMMIT;
@@ -0,0 +1,71 @@
+"""
+Recent wrong answers per (user, topic), used to personalize new quizzes.
+
+One RPC (see quiz_history.sql) replaces the attempt -> answers -> questions
+query chain, and results are kept briefly in a TTL cache. Submitting a quiz
+invalidates the entry so the next quiz sees the new mistakes.
+"""
+
+import os
+import logging
+
+from local_cache import LRUCache
+
+WRONG_QUESTIONS_CACHE_TTL = float(os.getenv("WRONG_QUESTIONS_CACHE_TTL", 120))
+WRONG_QUESTIONS_CACHE_SIZE = int(os.getenv("WRONG_QUESTIONS_CACHE_SIZE", 2048))
+WRONG_QUESTIONS_LIMIT = 10
+
+_wrong_questions_cache = LRUCache(maxsize=WRONG_QUESTIONS_CACHE_SIZE, ttl=WRONG_QUESTIONS_CACHE_TTL)
+
+
+def _fetch_wrong_questions_legacy(supabase, user_id, topic_id):
+    """Three-query fallback for databases without get_recent_wrong_questions."""
+    attempt_res = supabase.table("quiz_attempts") \
+        .select("attempt_id") \
+        .eq("user_id", user_id) \
+        .eq("topic_id", topic_id) \
+        .order("submitted_at", desc=True) \
+        .limit(1) \
+        .execute()
+    if not attempt_res.data:
+        return []
+
+    wrong_ans_res = supabase.table("quiz_answers") \
+        .select("question_id") \
+        .eq("attempt_id", attempt_res.data[0]["attempt_id"]) \
+        .eq("is_correct", False) \
+        .execute()
+    if not wrong_ans_res.data:
+        return []
+
+    wrong_qs_res = supabase.table("quiz_questions") \
+        .select("question_id, prompt, answer, answer_option_text, explanation") \
+        .in_("question_id", [a["question_id"] for a in wrong_ans_res.data]) \
+        .execute()
+    return wrong_qs_res.data or []
+
+
+def get_recent_wrong_questions(supabase, user_id, topic_id):
+    """Question rows the user got wrong in their latest attempt on the topic."""
+    key = (user_id, topic_id)
+    cached = _wrong_questions_cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        response = supabase.rpc("get_recent_wrong_questions", {
+            "p_user_id": user_id,
+            "p_topic_id": topic_id,
+            "p_limit": WRONG_QUESTIONS_LIMIT
+        }).execute()
+        rows = response.data or []
+    except Exception as e:
+        logging.warning(f"⚠️ get_recent_wrong_questions RPC failed, using legacy queries: {e}")
+        rows = _fetch_wrong_questions_legacy(supabase, user_id, topic_id)
+
+    _wrong_questions_cache.set(key, rows)
+    return rows
+
+
+def invalidate_wrong_questions(user_id, topic_id):
+    _wrong_questions_cache.pop((user_id, topic_id))
@@ -0,0 +1,32 @@
+-- Quiz history lookups for Recallo
+-- Lets quiz generation fetch a user's recent mistakes in one round-trip
+-- instead of three sequential queries.
+
+-- 1. Indexes backing the lookup
+CREATE INDEX IF NOT EXISTS idx_quiz_attempts_user_topic_submitted
+ON public.quiz_attempts USING btree (user_id, topic_id, submitted_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_quiz_answers_attempt_id
+ON public.quiz_answers USING btree (attempt_id);
+
+-- 2. Questions answered wrong in the user's most recent attempt on a topic
+CREATE OR REPLACE FUNCTION public.get_recent_wrong_questions(p_user_id uuid, p_topic_id uuid, p_limit integer DEFAULT 10)
+RETURNS SETOF public.quiz_questions
+LANGUAGE sql
+STABLE
+AS $$
+    WITH last_attempt AS (
+        SELECT attempt_id
+        FROM public.quiz_attempts
+        WHERE user_id = p_user_id AND topic_id = p_topic_id
+        ORDER BY submitted_at DESC
+        LIMIT 1
+    )
+    SELECT q.*
+    FROM last_attempt la
+    JOIN public.quiz_answers a ON a.attempt_id = la.attempt_id AND a.is_correct = false
+    JOIN public.quiz_questions q ON q.question_id = a.question_id
+    LIMIT p_limit;
+$$;
+
+COMMIT;
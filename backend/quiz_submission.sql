@@ -0,0 +1,101 @@
+-- Single-transaction quiz submission for Recallo
+-- Scores a quiz and records the attempt, answers, topic progress and topic
+-- status in one call, so a submission is either fully saved or not at all.
+
+-- 1. Parse text as jsonb, or NULL when it isn't valid JSON, so one malformed
+-- answer_option_text shows as 'N/A' instead of failing the whole submission.
+CREATE OR REPLACE FUNCTION public.try_parse_jsonb(p_text text)
+RETURNS jsonb
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+BEGIN
+    RETURN p_text::jsonb;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$;
+
+-- 2. Score and persist a submission.
+-- p_answers: [{"question_id": "...", "selected_answer": "A"}, ...]
+-- Returns {"attempt_id", "score", "total_questions", "correct_answers",
+--          "progress": {"last_score", "attempts_count", "mastered"},
+--          "topic_title", "email"}
+CREATE OR REPLACE FUNCTION public.submit_quiz_attempt(p_user_id uuid, p_topic_id uuid, p_answers jsonb)
+RETURNS json
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_attempt_id uuid := gen_random_uuid();
+    v_total integer := jsonb_array_length(p_answers);
+    v_correct integer;
+    v_score numeric;
+    v_progress public.user_topic_progress%ROWTYPE;
+    v_topic_title text;
+    v_email text;
+BEGIN
+    IF v_total = 0 THEN
+        RAISE EXCEPTION 'No answers submitted';
+    END IF;
+
+    INSERT INTO public.quiz_attempts (attempt_id, user_id, topic_id, score, submitted_at)
+    VALUES (v_attempt_id, p_user_id, p_topic_id, 0, now());
+
+    -- Grade every answer against the stored question and save it
+    INSERT INTO public.quiz_answers (answer_id, attempt_id, question_id, selected_answer, selected_answer_text, is_correct)
+    SELECT
+        gen_random_uuid(),
+        v_attempt_id,
+        (a->>'question_id')::uuid,
+        a->>'selected_answer',
+        coalesce(public.try_parse_jsonb(q.answer_option_text) ->> (a->>'selected_answer'), 'N/A'),
+        coalesce(q.answer = a->>'selected_answer', false)
+    FROM jsonb_array_elements(p_answers) a
+    LEFT JOIN public.quiz_questions q ON q.question_id = (a->>'question_id')::uuid;
+
+    SELECT count(*) INTO v_correct
+    FROM public.quiz_answers
+    WHERE attempt_id = v_attempt_id AND is_correct;
+    v_score := v_correct::numeric / v_total * 10;
+
+    UPDATE public.quiz_attempts SET score = v_score WHERE attempt_id = v_attempt_id;
+
+    -- Update or insert progress
+    UPDATE public.user_topic_progress
+    SET last_score = v_score,
+        attempts_count = coalesce(attempts_count, 0) + 1,
+        mastered = coalesce(mastered, false) OR v_score >= 7,
+        last_attempt = now()
+    WHERE user_id = p_user_id AND topic_id = p_topic_id
+    RETURNING * INTO v_progress;
+
+    IF NOT FOUND THEN
+        INSERT INTO public.user_topic_progress (user_id, topic_id, last_score, attempts_count, mastered, last_attempt)
+        VALUES (p_user_id, p_topic_id, v_score, 1, v_score >= 7, now())
+        RETURNING * INTO v_progress;
+    END IF;
+
+    UPDATE public.topics
+    SET topic_status = CASE WHEN v_score > 7 THEN 'Completed' ELSE 'Weak' END
+    WHERE topic_id = p_topic_id
+    RETURNING title INTO v_topic_title;
+
+    SELECT email INTO v_email FROM public.users WHERE user_id = p_user_id;
+
+    RETURN json_build_object(
+        'attempt_id', v_attempt_id,
+        'score', v_score,
+        'total_questions', v_total,
+        'correct_answers', v_correct,
+        'progress', json_build_object(
+            'last_score', v_progress.last_score,
+            'attempts_count', v_progress.attempts_count,
+            'mastered', v_progress.mastered
+        ),
+        'topic_title', v_topic_title,
+        'email', v_email
+    );
+END;
+$$;
+
+COMMIT;
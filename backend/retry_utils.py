@@ -0,0 +1,36 @@
+import time
+import random
+import logging
+
+
+def call_with_retry(fn, *args, attempts=3, base_delay=1.0, max_delay=30.0, retry_on=(Exception,), should_retry=None,
+                    label=None, **kwargs):
+    """
+    Call fn(*args, **kwargs), retrying with exponential backoff and jitter.
+
+    Args:
+        fn: Callable to invoke
+        attempts: Total number of tries before the last error is re-raised
+        base_delay: Delay in seconds before the first retry (doubled each time)
+        max_delay: Upper bound for a single delay
+        retry_on: Exception types that should trigger a retry
+        should_retry: Optional predicate on the exception; False re-raises immediately
+        label: Optional name used in log messages
+
+    Returns:
+        Whatever fn returns on the first successful call
+    """
+    name = label or getattr(fn, "__name__", "call")
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn(*args, **kwargs)
+        except retry_on as e:
+            if should_retry is not None and not should_retry(e):
+                raise
+            if attempt == attempts:
+                logging.error(f"❌ {name} failed after {attempts} attempts: {e}")
+                raise
+            delay = min(max_delay, base_delay * (2 ** (attempt - 1)))
+            delay += random.uniform(0, delay / 2)
+            logging.warning(f"⚠️ {name} failed (attempt {attempt}/{attempts}): {e}. Retrying in {delay:.1f}s")
+            time.sleep(delay)
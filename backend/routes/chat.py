@@ -4,13 +4,14 @@ import logging
 import uuid
 import os
 from supabase import create_client
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain.memory import ConversationBufferWindowMemory
+from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.chains import ConversationChain
 from langchain.schema import HumanMessage
-from langchain_pinecone import PineconeVectorStore
-from pinecone import Pinecone
-from fetch_text_supabase import fetch_text_from_supabase
+from fetch_text_supabase import texts_from_matches
+from embedding_cache import get_cached_embeddings
+from conversation_memory import get_memory_store
+from vector_store import get_vector_store
+from sse_utils import format_sse, sse_response, token_text
 
 # Create blueprint
 chat_bp = Blueprint('chat', __name__)
@@ -22,9 +23,8 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
 supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=GEMINI_API_KEY, temperature=0.7)
-memory = ConversationBufferWindowMemory(k=10, return_messages=True)
-conversation = ConversationChain(llm=llm, memory=memory, verbose=True)
-embedding_fn = GoogleGenerativeAIEmbeddings(model="models/embedding-001", google_api_key=GEMINI_API_KEY)
+memory_store = get_memory_store(supabase)
+embedding_fn = get_cached_embeddings(GEMINI_API_KEY)
 
 def insert_chat_log_supabase_with_conversation(user_id, conv_id, user_msg, resp_msg):
     """Insert chat log into Supabase with conversation tracking"""
@@ -51,6 +51,35 @@ def insert_chat_log_supabase_with_conversation(user_id, conv_id, user_msg, resp_
         logging.error(f"Supabase insert error: {e}")
         return None
 
+def resolve_conversation(user_id, conv_id):
+    """Return (conversation_id, is_new), creating a conversation when conv_id is missing or not the user's."""
+    # Validate existing conversation
+    if conv_id:
+        try:
+            existing_conv = supabase.table("conversations").select("conversation_id").eq("conversation_id", conv_id).eq("user_id", user_id).execute()
+            if not existing_conv.data:
+                conv_id = None
+        except Exception as e:
+            logging.error(f"Error validating conversation: {e}")
+            conv_id = None
+
+    if conv_id:
+        return conv_id, False
+
+    # Create new conversation
+    try:
+        new_conv_response = supabase.table("conversations").insert({
+            "conversation_id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "title": "New Chat"
+        }).execute()
+    except Exception as e:
+        logging.error(f"Error creating conversation: {e}")
+        raise
+    if not new_conv_response.data:
+        raise Exception("Failed to create conversation")
+    return new_conv_response.data[0]["conversation_id"], True
+
 @chat_bp.route('/chat', methods=['POST', 'OPTIONS'])
 @cross_origin()
 def chat():
@@ -80,32 +109,10 @@ def chat():
 
         logging.info(f"Received message: {user_message} from user: {user_id}")
 
-        # Validate existing conversation
-        if conv_id:
-            try:
-                existing_conv = supabase.table("conversations").select("conversation_id").eq("conversation_id", conv_id).eq("user_id", user_id).execute()
-                if not existing_conv.data:
-                    conv_id = None
-            except Exception as e:
-                logging.error(f"Error validating conversation: {e}")
-                conv_id = None
-
-        # Create new conversation if needed
-        if not conv_id:
-            try:
-                new_conv_response = supabase.table("conversations").insert({
-                    "conversation_id": str(uuid.uuid4()),
-                    "user_id": user_id,
-                    "title": "New Chat"
-                }).execute()
-
-                if new_conv_response.data:
-                    conv_id = new_conv_response.data[0]["conversation_id"]
-                else:
-                    return jsonify({"error": "Failed to create conversation"}), 500
-            except Exception as e:
-                logging.error(f"Error creating conversation: {e}")
-                return jsonify({"error": "Failed to create conversation"}), 500
+        try:
+            conv_id, is_new_conversation = resolve_conversation(user_id, conv_id)
+        except Exception:
+            return jsonify({"error": "Failed to create conversation"}), 500
 
         # Generate response
         prompt = f"""
@@ -120,11 +127,17 @@ def chat():
         User message: {user_message}
         """
 
+        # Each request works on its own copy of the history; the chain is cheap to build per request
+        memory, latest = memory_store.load(conv_id, is_new=is_new_conversation)
+        conversation = ConversationChain(llm=llm, memory=memory)
         reply = conversation.predict(input=user_message)
 
         # Save conversation
         saved_log = insert_chat_log_supabase_with_conversation(user_id, conv_id, user_message, reply)
-        if not saved_log:
+        if saved_log:
+            memory_store.record(conv_id, latest, user_message, reply, saved_log.get("created_at"))
+        else:
+            memory_store.forget(conv_id)
             logging.warning("Failed to save chat log, but continuing with response")
 
         return jsonify({
@@ -136,6 +149,55 @@ def chat():
         logging.error(f"/chat error: {e}")
         return jsonify({"error": "Something went wrong"}), 500
 
+@chat_bp.route('/chat/stream', methods=['POST'])
+@cross_origin()
+def chat_stream():
+    """Like /chat, but sends the reply as "token" events while Gemini generates it."""
+    data = request.get_json(silent=True) or {}
+    user_message = data.get("message", "")
+    user_id = data.get("user_id")
+
+    if not user_message:
+        return jsonify({"error": "No message provided"}), 400
+    if not user_id:
+        return jsonify({"error": "No user_id provided"}), 400
+
+    try:
+        conv_id, is_new_conversation = resolve_conversation(user_id, data.get("conversation_id"))
+    except Exception:
+        return jsonify({"error": "Failed to create conversation"}), 500
+
+    def events():
+        yield format_sse({"conversation_id": conv_id}, event="conversation")
+        try:
+            memory, latest = memory_store.load(conv_id, is_new=is_new_conversation)
+            # Same prompt ConversationChain.predict would send
+            conversation = ConversationChain(llm=llm, memory=memory)
+            prompt = conversation.prompt.format(input=user_message, **memory.load_memory_variables({}))
+
+            parts = []
+            for chunk in llm.stream(prompt):
+                text = token_text(chunk)
+                if text:
+                    parts.append(text)
+                    yield format_sse({"text": text}, event="token")
+            reply = "".join(parts)
+        except Exception as e:
+            logging.error(f"/chat/stream error: {e}")
+            yield format_sse({"error": "Something went wrong"}, event="error")
+            return
+
+        # Only a completed reply becomes part of the history
+        saved_log = insert_chat_log_supabase_with_conversation(user_id, conv_id, user_message, reply)
+        if saved_log:
+            memory_store.record(conv_id, latest, user_message, reply, saved_log.get("created_at"))
+        else:
+            memory_store.forget(conv_id)
+            logging.warning("Failed to save chat log, but continuing with response")
+        yield format_sse({"conversation_id": conv_id, "response": reply}, event="done")
+
+    return sse_response(events())
+
 @chat_bp.route('/ask', methods=['POST'])
 def ask():
     try:
@@ -148,38 +210,27 @@ def ask():
         logging.error(f"❌ Ask route error: {str(e)}")
         return jsonify({"error": "Internal server error"}), 500
 
+def retrieve_relevant_docs(user_query, user_id):
+    """Text of the user's chunks most similar to the query, best match first."""
+    query_embedding = embedding_fn.embed_query(user_query)
+    matches = get_vector_store().query(query_embedding, user_id, top_k=5)
+
+    # Use the text stored with each vector; only chunks without it go back to Supabase
+    return texts_from_matches(supabase, matches, user_id)
+
+def build_document_prompt(relevant_docs, user_query):
+    combined_text = "\n".join(relevant_docs)
+    return combined_text + "\n\nUser Question: " + user_query
+
 def get_answer_from_file(user_query, user_id):
     try:
         if not user_query or not user_id:
             return jsonify({"error": "Missing user_query or user_id"}), 400
 
-        # Initialize Pinecone
-        pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-        index = pc.Index("document-index")
-        
-        # Perform similarity search
-        query_embedding = embedding_fn.embed_query(user_query)
-        pinecone_results = index.query(
-            vector=query_embedding,
-            filter={"user_id": user_id},
-            top_k=5,
-            include_metadata=True
-        )
-
-        if not pinecone_results['matches']:
-            return jsonify({"response": "No relevant content found."}), 200
-
-        # Fetch relevant documents
-        relevant_docs = []
-        for match in pinecone_results['matches']:
-            chunk_id = match['id']
-            chunk_data = fetch_text_from_supabase(supabase, chunk_id, user_id)
-            if chunk_data:
-                relevant_docs.append(chunk_data)
+        relevant_docs = retrieve_relevant_docs(user_query, user_id)
 
         if relevant_docs:
-            combined_text = "\n".join(relevant_docs)
-            prompt = combined_text + "\n\nUser Question: " + user_query
+            prompt = build_document_prompt(relevant_docs, user_query)
             result = llm([HumanMessage(content=prompt)])
 
             return jsonify({
@@ -191,4 +242,40 @@ def get_answer_from_file(user_query, user_id):
 
     except Exception as e:
         logging.error(f"Error in get_answer_from_file: {e}")
-        return jsonify({"error": "Failed to fetch answer"}), 500
\ No newline at end of file
+        return jsonify({"error": "Failed to fetch answer"}), 500
+
+@chat_bp.route('/ask/stream', methods=['POST'])
+@cross_origin()
+def ask_stream():
+    """Like /ask, but streams the answer as "token" events; "done" carries the full answer and sources."""
+    data = request.get_json(silent=True) or {}
+    user_query = data.get("message", "")
+    user_id = data.get("user_id")
+
+    if not user_query or not user_id:
+        return jsonify({"error": "Missing user_query or user_id"}), 400
+
+    try:
+        relevant_docs = retrieve_relevant_docs(user_query, user_id)
+    except Exception as e:
+        logging.error(f"Error in ask_stream retrieval: {e}")
+        return jsonify({"error": "Failed to fetch answer"}), 500
+
+    def events():
+        if not relevant_docs:
+            yield format_sse({"response": "No relevant content found.", "source_documents": []}, event="done")
+            return
+        try:
+            parts = []
+            for chunk in llm.stream([HumanMessage(content=build_document_prompt(relevant_docs, user_query))]):
+                text = token_text(chunk)
+                if text:
+                    parts.append(text)
+                    yield format_sse({"text": text}, event="token")
+        except Exception as e:
+            logging.error(f"Error in ask_stream: {e}")
+            yield format_sse({"error": "Failed to fetch answer"}, event="error")
+            return
+        yield format_sse({"response": "".join(parts), "source_documents": relevant_docs}, event="done")
+
+    return sse_response(events())
@@ -8,6 +8,7 @@ from supabase import create_client
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 from langchain.memory import ConversationBufferWindowMemory
 from langchain.chains import ConversationChain
+from conversation_memory import get_memory_store
 
 
 load_dotenv()
@@ -179,6 +180,7 @@ def delete_conversation(conversation_id):
 
         # Then delete the conversation
         response = supabase.table("conversations").delete().eq("conversation_id", conversation_id).execute()
+        get_memory_store(supabase).forget(conversation_id)
 
         return jsonify({"message": "Conversation deleted successfully"}), 200
     except Exception as e:
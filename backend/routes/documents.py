@@ -4,7 +4,9 @@ import os
 import hashlib
 from supabase import create_client
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from upload_pdf import process_pdf
+from upload_pdf import generate_unique_file_id
+from ingestion_jobs import submit_job, find_active_job, is_file_ingesting
+from content_cache import get_file_content
 
 # Create blueprint
 documents_bp = Blueprint('documents', __name__)
@@ -59,6 +61,13 @@ def upload_file():
         if response.data and len(response.data) > 0:
             logging.info(f"Duplicate upload detected for user {user_id} with file hash {file_hash}")
             return jsonify({"message": "You have already uploaded this file earlier."}), 409
+
+        active_job = find_active_job("document", user_id, file_hash)
+        if active_job:
+            return jsonify({
+                "message": "This file is already being processed.",
+                "job_id": active_job["job_id"]
+            }), 409
     except Exception as e:
         logging.error(f"Error querying Supabase: {e}")
         return jsonify({"error": "Internal server error checking uploads."}), 500
@@ -69,30 +78,35 @@ def upload_file():
         if not os.path.exists(upload_folder):
             os.makedirs(upload_folder)
 
-        file_path = os.path.join(upload_folder, file.filename)
+        # Prefix with a UUID so concurrent uploads of the same filename don't clobber each other
+        file_uid = generate_unique_file_id()
+        file_path = os.path.join(upload_folder, f"{file_uid}_{file.filename}")
         file.save(file_path)
         logging.info(f"📥 File saved: {file_path}")
 
         try:
-            # Process PDF file
-            success, chunk_count, uploaded_filename, file_uid = process_pdf(
-                file_path, supabase, GEMINI_API_KEY, user_id, file_hash
-            )
+            # Hand the PDF to the background ingestion workers
+            job_id = submit_job("document", {
+                "file_path": os.path.abspath(file_path),
+                "file_name": file.filename,
+                "user_id": user_id,
+                "file_hash": file_hash,
+                "file_uuid": file_uid
+            }, user_id=user_id, file_hash=file_hash)
 
             recent_file_uid = file_uid  # Store in global variable
-            logging.info(f"File UUID stored: {recent_file_uid}")
+            logging.info(f"🗂️ File UUID: {file_uid}, job: {job_id}")
 
-            if success:
-                logging.info(f"📌 recent_filename set to: {uploaded_filename}")
-                logging.info(f"🗂️ File UUID: {file_uid}")
-                return jsonify({
-                    "message": f"PDF processed. {chunk_count} chunks saved from '{uploaded_filename}'."
-                }), 200
-            else:
-                return jsonify({"error": f"Failed to process PDF: {chunk_count}"}), 500
+            return jsonify({
+                "message": f"'{file.filename}' queued for processing.",
+                "job_id": job_id,
+                "status_url": f"/api/jobs/{job_id}"
+            }), 202
 
         except Exception as e:
-            logging.error(f"Error during PDF processing: {str(e)}")
+            logging.error(f"Error queueing PDF processing: {str(e)}")
+            if os.path.exists(file_path):
+                os.remove(file_path)
             return jsonify({"error": "Failed to process the PDF file."}), 500
 
     return jsonify({"error": "Invalid file type"}), 400
@@ -104,14 +118,14 @@ def get_summary():
 
         if not recent_file_uid:
             return jsonify({"error": "No recent file uploaded"}), 400
+        if is_file_ingesting(recent_file_uid):
+            return jsonify({"message": "The file is still being processed."}), 202
 
-        response = supabase.table('documents').select('id', 'content').eq('file_uuid', recent_file_uid).execute()
-        docs = response.data
-
-        if not docs:
+        file_content = get_file_content(supabase, recent_file_uid)
+        if not file_content:
             return jsonify({"error": "No content found for the given file."}), 404
 
-        concatenated_text = "\n\n".join(doc['content'] for doc in docs)
+        concatenated_text = file_content["content"]
 
         prompt = f"""
         You are an expert assistant with a deep understanding of how to summarize complex documents in a clear, concise, and professional manner. Based on the following content, summarize the key points in a way that is easy to understand, highlighting the most important information while keeping the summary brief and to the point.
@@ -136,7 +150,7 @@ def get_summary():
         summary = summary.strip()
 
         # Save summary to the first document row
-        first_id = docs[0]['id']
+        first_id = file_content["first_id"]
         supabase.table("documents").update({"summary": summary}).eq("id", first_id).execute()
 
         return jsonify({"response": summary}), 200
@@ -151,12 +165,14 @@ def generate_questions():
     try:
         if not recent_file_uid:
             return jsonify({"error": "No recent file uploaded"}), 400
+        if is_file_ingesting(recent_file_uid):
+            return jsonify({"message": "The file is still being processed."}), 202
 
-        docs = supabase.table('documents').select('content').eq('file_uuid', recent_file_uid).execute().data
-        if not docs:
+        file_content = get_file_content(supabase, recent_file_uid)
+        if not file_content:
             return jsonify({"error": "No content found"}), 404
 
-        concatenated_text = "\n\n".join(doc['content'] for doc in docs)
+        concatenated_text = file_content["content"]
 
         prompt = f"""
         You are an expert educator with a deep understanding of how to generate relevant and insightful questions from a given text. Based on the following document, create a mixture of **Multiple Choice Questions (MCQs)** and **broad, open-ended questions** that focus on the most important topics discussed in the text.
@@ -6,6 +6,7 @@ import json
 from datetime import datetime, timedelta
 import logging
 from dotenv import load_dotenv
+from content_cache import get_topic_content
 
 # Import ChatGoogleGenerativeAI from the correct library
 from langchain_google_genai import ChatGoogleGenerativeAI
@@ -67,8 +68,7 @@ def generate_flashcards():
         question_map = {q["question_id"]: q for q in questions_response.data}
         
         # Fetch merged content from the topic
-        topic_response = supabase.from_("topics").select("merged_content").eq("topic_id", topic_id).single().execute()
-        merged_content = topic_response.data.get("merged_content") if topic_response.data else None
+        merged_content = get_topic_content(supabase, topic_id)
 
         
         merged = []
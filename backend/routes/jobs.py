@@ -0,0 +1,21 @@
+from flask import Blueprint, jsonify, request
+import logging
+from ingestion_jobs import get_job, public_job_view
+
+jobs_bp = Blueprint('jobs', __name__)
+bp = jobs_bp  # Alias for backward compatibility
+
+@bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Report the status and current stage of a background ingestion job"""
+    try:
+        user_id = request.args.get("user_id")
+        if not user_id:
+            return jsonify({"error": "Missing user_id"}), 400
+        job = get_job(job_id)
+        if not job or job["user_id"] != user_id:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(public_job_view(job)), 200
+    except Exception as e:
+        logging.error(f"Error fetching job {job_id}: {e}")
+        return jsonify({"error": "Failed to fetch job status"}), 500
@@ -1,8 +1,10 @@
 from flask import Blueprint, request, jsonify, current_app
 import logging
 import os
+import threading
 from datetime import datetime, timezone, timedelta
 from supabase import create_client
+import notification_settings
 
 # Create blueprint
 notifications_bp = Blueprint('notifications', __name__)
@@ -12,24 +14,15 @@ SUPABASE_URL = os.getenv("SUPABASE_URL", "https://bhrwvazkvsebdxstdcow.supabase.
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-# Temporary in-memory storage for notification settings (until tables are created)
-_notification_settings = {}
-
 # Helper functions for notification preferences
 def is_topic_notification_enabled(user_id, topic_id):
-    # For now, default to enabled since the preferences table doesn't exist
-    # This can be changed later when the preferences table is created
-    return True
+    return notification_settings.is_topic_enabled(user_id, topic_id)
 
 def is_user_email_notification_enabled_global(user_id):
-    # For now, default to enabled since the settings table doesn't exist
-    # This can be changed later when the settings table is created
-    return True
+    return notification_settings.is_email_enabled(user_id)
 
 def is_daily_reminders_enabled(user_id):
-    # For now, default to enabled since the settings table doesn't exist
-    # This can be changed later when the settings table is created
-    return True
+    return notification_settings.is_daily_reminders_enabled(user_id)
 
 def has_been_notified_today(user_id, topic_id, notif_type):
     today = datetime.now(timezone.utc).date().isoformat()
@@ -104,11 +97,10 @@ The Recallo Team
 """
     return send_email(user_email, subject, message.strip())
 
-def send_reminder_email(user_email, user_name, title, score, notif_type):
-    try:
-        if notif_type == "daily":
-            subject = f"Daily Study Reminder: {title}"
-            message = f"""
+def build_reminder_email(user_name, title, score, notif_type):
+    if notif_type == "daily":
+        subject = f"Daily Study Reminder: {title}"
+        message = f"""
 Hi {user_name},
 
 This is your daily reminder to review the topic: \"{title}\".
@@ -118,9 +110,9 @@ Your current score is {score}/10. With consistent practice, you can improve your
 Keep learning!
 The Recallo Team
 """
-        else:
-            subject = f"Weekly Review: {title}"
-            message = f"""
+    else:
+        subject = f"Weekly Review: {title}"
+        message = f"""
 Hi {user_name},
 
 Time for your weekly review of: \"{title}\".
@@ -130,24 +122,49 @@ You've mastered this topic with a score of {score}/10. A quick review will help
 Best regards,
 The Recallo Team
 """
-        return send_email(user_email, subject, message.strip())
-    except Exception as e:
-        logging.error(f"Error sending reminder email: {e}")
-        return False
+    return subject, message.strip()
 
-def process_notifications():
+def send_reminder_email(user_email, user_name, title, score, notif_type):
     try:
-        resp = supabase.table("user_topic_review_features").select(
-            "user_id, topic_id, title, latest_score"
-        ).execute()
-        if not resp.data:
-            logging.info("No review features found")
-            return
+        subject, message = build_reminder_email(user_name, title, score, notif_type)
+        return send_email(user_email, subject, message)
     except Exception as e:
-        logging.error(f"Failed to fetch review features: {e}")
-        return
+        logging.error(f"Error sending reminder email: {e}")
+        return False
 
-    for row in resp.data:
+NOTIFICATION_PAGE_SIZE = 1000
+NOTIFICATION_IN_CHUNK = 200
+
+def _fetch_all(make_query, page_size=NOTIFICATION_PAGE_SIZE):
+    """Read every row of a query, page by page (PostgREST caps rows per response)."""
+    rows = []
+    start = 0
+    while True:
+        page = make_query().range(start, start + page_size - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+def _fetch_in(table, columns, key, values, chunk_size=NOTIFICATION_IN_CHUNK):
+    """Rows whose key is in values, in a few chunked in_() queries."""
+    values = list(values)
+    rows = []
+    for i in range(0, len(values), chunk_size):
+        rows.extend(supabase.table(table).select(columns).in_(key, values[i:i + chunk_size]).execute().data or [])
+    return rows
+
+def plan_notifications(features, sent_today, users, settings):
+    """
+    Decide which reminders to send, in one pass over the review features.
+
+    sent_today is a set of (user_id, topic_id, notification_type) already sent
+    today, users maps user_id to its users row and settings maps user_id to
+    its notification preferences. Returns a list of reminder dicts ready to
+    send.
+    """
+    planned = []
+    for row in features:
         uid = row["user_id"]
         tid = row["topic_id"]
         title = row["title"]
@@ -160,37 +177,119 @@ def process_notifications():
 
         nt = "daily" if score < 8 else "weekly"
 
-        if not is_user_email_notification_enabled_global(uid):
+        user_settings = settings.get(uid) or notification_settings.DEFAULT_SETTINGS
+        global_settings = user_settings["global_settings"]
+        if not global_settings.get("email_notifications_enabled", True):
             logging.info(f"Skipped {uid} — global notifications disabled")
             continue
-        if score < 8 and not is_daily_reminders_enabled(uid):
+        if score < 8 and not global_settings.get("daily_reminders_enabled", True):
             logging.info(f"Skipped {uid}/{tid} — daily reminders off for low score {score}")
             continue
-        if not is_topic_notification_enabled(uid, tid):
+        if user_settings["topic_settings"].get(tid) is False:
             logging.info(f"Skipped {uid}/{tid} — topic notification off")
             continue
-        if has_been_notified_today(uid, tid, nt):
+        if (uid, tid, nt) in sent_today:
             logging.info(f"Skipped {uid}/{tid} — already notified today ({nt})")
             continue
 
-        try:
-            user_resp = supabase.table("users").select("email, name").eq("user_id", uid).execute()
-            if not user_resp.data or len(user_resp.data) == 0:
-                logging.info(f"Could not find user email for {uid} - user may not exist in users table")
-                continue
-        except Exception as e:
-            logging.info(f"Error fetching user {uid}: {e}")
+        user = users.get(uid)
+        if not user or not user.get("email"):
+            logging.info(f"Could not find user email for {uid} - user may not exist in users table")
             continue
 
-        user_email = user_resp.data[0]["email"]
-        user_name = user_resp.data[0].get("name", "Learner")
+        # Mark it so a duplicate feature row can't send the same reminder twice
+        sent_today.add((uid, tid, nt))
+        planned.append({
+            "user_id": uid,
+            "topic_id": tid,
+            "title": title,
+            "score": score,
+            "notification_type": nt,
+            "email": user["email"],
+            "name": user.get("name") or "Learner"
+        })
+    return planned
+
+def process_notifications():
+    try:
+        features = _fetch_all(lambda: supabase.table("user_topic_review_features").select(
+            "user_id, topic_id, title, latest_score"
+        ).order("user_id").order("topic_id"))
+        if not features:
+            logging.info("No review features found")
+            return
+    except Exception as e:
+        logging.error(f"Failed to fetch review features: {e}")
+        return
+
+    now = datetime.now(timezone.utc)
+    today = now.date().isoformat()
+    try:
+        sent_rows = _fetch_all(lambda: supabase.table("user_notifications")
+                               .select("user_id, topic_id, notification_type")
+                               .eq("sent_date", today)
+                               .order("id"))
+        sent_today = {(r["user_id"], r["topic_id"], r["notification_type"]) for r in sent_rows}
+
+        user_ids = {row["user_id"] for row in features}
+        user_rows = _fetch_in("users", "user_id, email, name", "user_id", user_ids)
+        users = {u["user_id"]: u for u in user_rows}
+    except Exception as e:
+        logging.error(f"Failed to load notification state: {e}")
+        return
+
+    try:
+        settings_rows = _fetch_in("user_notification_settings", notification_settings.STORED_SETTINGS_COLUMNS,
+                                  "user_id", user_ids)
+    except Exception as e:
+        logging.warning(f"⚠️ Could not load notification settings, using defaults: {e}")
+        settings_rows = []
+    settings = notification_settings.get_settings_many(user_ids, settings_rows)
+
+    planned = plan_notifications(features, sent_today, users, settings)
+    if not planned:
+        logging.info("No reminders due")
+        return
 
-        if send_reminder_email(user_email, user_name, title, score, nt):
-            message_body = f"{nt.title()} reminder sent for {title} (score: {score}/10)"
-            record_notification(uid, tid, nt, message_body)
-            logging.info(f"✅ Sent {nt} reminder to {user_email} for topic: {title}")
-        else:
-            logging.error(f"❌ Failed to send {nt} reminder to {user_email}")
+    emails = []
+    for n in planned:
+        subject, body = build_reminder_email(n["name"], n["title"], n["score"], n["notification_type"])
+        emails.append({"to": n["email"], "subject": subject, "body": body})
+
+    sent_count = 0
+    count_lock = threading.Lock()
+
+    def record_batch(start, errors):
+        """Record a batch's sent reminders right away, so a crash or re-run later can't send them again."""
+        nonlocal sent_count
+        records = []
+        for n, error in zip(planned[start:start + len(errors)], errors):
+            if error is not None:
+                logging.error(f"❌ Failed to send {n['notification_type']} reminder to {n['email']}")
+                continue
+            next_at = now + (timedelta(days=1) if n["notification_type"] == "daily" else timedelta(days=7))
+            records.append({
+                "user_id": n["user_id"],
+                "topic_id": n["topic_id"],
+                "notification_type": n["notification_type"],
+                "sent_at": now.isoformat(),
+                "sent_date": today,
+                "next_notification_at": next_at.isoformat(),
+                "status": "sent",
+                "message": f"{n['notification_type'].title()} reminder sent for {n['title']} (score: {n['score']}/10)"
+            })
+        if records:
+            try:
+                supabase.table("user_notifications").insert(records).execute()
+            except Exception as e:
+                logging.error(f"❌ Failed to record {len(records)} sent notifications: {e}")
+        with count_lock:
+            sent_count += len(records)
+
+    from email_utils import send_emails
+    send_emails(emails, on_batch=record_batch)
+
+    logging.info(f"✅ Sent {sent_count}/{len(planned)} reminders")
 
 @notifications_bp.route("/send-exam-email", methods=["POST"])
 def send_exam_email():
@@ -221,14 +320,7 @@ def run_notifications_route():
 def get_notification_settings(user_id):
     """Get user's notification preferences"""
     try:
-        # Use in-memory storage as fallback
-        user_settings = _notification_settings.get(user_id, {
-            "global_settings": {
-                "email_notifications_enabled": True,
-                "daily_reminders_enabled": True
-            },
-            "topic_settings": {}
-        })
+        user_settings = notification_settings.get_settings(user_id)
 
         logging.info(f"📥 GET notification settings for user {user_id}: {user_settings}")
         return jsonify(user_settings), 200
@@ -254,14 +346,7 @@ def update_notification_settings(user_id):
 
         logging.info(f"📤 Updating settings for user {user_id}: {data}")
 
-        # Store in memory (temporary solution)
-        _notification_settings[user_id] = {
-            "global_settings": data.get("global_settings", {
-                "email_notifications_enabled": True,
-                "daily_reminders_enabled": True
-            }),
-            "topic_settings": data.get("topic_settings", {})
-        }
+        notification_settings.update_settings(user_id, data)
 
         logging.info(f"✅ Settings updated in memory for user {user_id}")
         return jsonify({"message": "Notification settings updated successfully"}), 200
@@ -8,8 +8,9 @@ import uuid
 import hashlib
 import json
 from supabase import create_client
-from process_pdf_for_quiz import process_pdf_for_quiz
-from QA_ANSWER import generate_and_save_mcqs
+from ingestion_jobs import submit_job, find_active_job
+from QA_ANSWER import generate_and_save_mcqs, stream_mcqs
+from sse_utils import format_sse, sse_response
 from matching_q_a import evaluate_and_save_quiz
 
 quiz_bp = Blueprint('quiz', __name__)
@@ -44,6 +45,13 @@ def quiz_question():
             response = supabase.table('topics').select('topic_id').eq('user_id', user_id).eq('hash_file', file_hash).execute()
             if response.data:
                 return jsonify({"message": "You have already uploaded this file earlier."}), 409
+
+            active_job = find_active_job("quiz", user_id, file_hash)
+            if active_job:
+                return jsonify({
+                    "message": "This file is already being processed.",
+                    "job_id": active_job["job_id"]
+                }), 409
         except Exception as e:
             return jsonify({"error": "Internal server error checking uploads."}), 500
 
@@ -56,15 +64,17 @@ def quiz_question():
             temp_path = os.path.join(upload_folder, temp_filename)
             file.save(temp_path)
 
-            result = process_pdf_for_quiz(temp_path, GEMINI_API_KEY, user_id, supabase, file_hash)
-
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            job_id = submit_job("quiz", {
+                "file_path": os.path.abspath(temp_path),
+                "user_id": user_id,
+                "file_hash": file_hash
+            }, user_id=user_id, file_hash=file_hash)
 
-            if result and result.get("status") == "success":
-                return jsonify({"message": "Topics saved successfully."}), 200
-            else:
-                return jsonify({"error": "Failed to process PDF."}), 500
+            return jsonify({
+                "message": "File queued for topic extraction.",
+                "job_id": job_id,
+                "status_url": f"/api/jobs/{job_id}"
+            }), 202
 
         return jsonify({"error": "Invalid file type."}), 400
 
@@ -115,7 +125,41 @@ def generate_questions():
         response.headers.add("Access-Control-Allow-Origin", "http://localhost:5173")
         return response, 500
 
-    
+
+@quiz_bp.route("/generate-questions/stream", methods=['POST', 'OPTIONS'])
+def generate_questions_stream():
+    if request.method == 'OPTIONS':
+        response = make_response()
+        response.headers.add("Access-Control-Allow-Origin", "http://localhost:5173")
+        response.headers.add("Access-Control-Allow-Headers", "Content-Type")
+        response.headers.add("Access-Control-Allow-Methods", "POST, OPTIONS")
+        return response, 204
+
+    data = request.get_json() or {}
+    user_id = data.get("user_id")
+    topic_id = data.get("topic_id")
+    difficulty = data.get("difficulty_mode", "hard")
+
+    if not topic_id:
+        return jsonify({"error": "Missing topic_id."}), 400
+
+    # Each question is sent as a "question" event as soon as it parses; "done" follows
+    # once the quiz is persisted, so answers should only be submitted after it arrives.
+    def events():
+        try:
+            for event, payload in stream_mcqs(topic_id, GEMINI_API_KEY, difficulty, user_id):
+                if event == "question":
+                    yield format_sse(payload, event="question")
+                else:
+                    yield format_sse({"question_ids": [q["question_id"] for q in payload]}, event="done")
+        except Exception as e:
+            logging.exception("Error while streaming quiz questions")
+            yield format_sse({"error": str(e)}, event="error")
+
+    response = sse_response(events())
+    response.headers.add("Access-Control-Allow-Origin", "http://localhost:5173")
+    return response
+
 
 @quiz_bp.route("/submit-answers", methods=["POST", "OPTIONS"])
 @cross_origin()
@@ -3,6 +3,7 @@ from supabase import create_client
 from langchain_google_genai import ChatGoogleGenerativeAI
 import os
 import logging
+from content_cache import get_document_content
 
 summary_bp = Blueprint('summary', __name__)
 bp = summary_bp  # Alias for backward compatibility
@@ -25,12 +26,9 @@ def generate_summary():
             return jsonify({"error": "Missing document_id or user_id"}), 400
 
         # Fetch document content
-        response = supabase.table('documents').select('content').eq('id', document_id).eq('user_id', user_id).execute()
-        if not response.data:
+        content = get_document_content(supabase, document_id, user_id)
+        if content is None:
             return jsonify({"error": "Document not found"}), 404
-
-        # Concatenate content
-        content = "\n\n".join([chunk['content'] for chunk in response.data])
         
         # Generate summary
         prompt = f"""
@@ -0,0 +1,28 @@
+import json
+
+from flask import Response, stream_with_context
+
+
+def format_sse(data, event=None):
+    """Serialize one Server-Sent Event; data is sent as a single JSON line."""
+    message = f"data: {json.dumps(data)}\n\n"
+    if event:
+        message = f"event: {event}\n{message}"
+    return message
+
+
+def sse_response(events):
+    """Wrap a generator of formatted events in an unbuffered text/event-stream response."""
+    response = Response(stream_with_context(events), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Stop reverse proxies (nginx) from holding events back until the stream ends
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+def token_text(chunk):
+    """Text of one streamed LLM chunk; Gemini sometimes sends content as a list of parts."""
+    content = chunk.content
+    if isinstance(content, list):
+        return "".join(part if isinstance(part, str) else part.get("text", "") for part in content)
+    return content or ""
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for the email outbox, using a local aiosmtpd server instead of Gmail.
+
+Requires: pip install aiosmtpd (listed in ai-engine/requirements.txt)
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the test outbox away from the real one
+os.environ["EMAIL_OUTBOX_DB"] = os.path.join(tempfile.mkdtemp(), "email_outbox.sqlite3")
+
+Controller = pytest.importorskip("aiosmtpd.controller").Controller
+from flask import Flask
+
+import email_outbox
+from mailer import init_mail
+
+SMTP_PORT = 8025
+
+
+class CollectingHandler:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def make_app(port):
+    app = Flask(__name__)
+    app.config.update(
+        MAIL_SERVER="localhost",
+        MAIL_PORT=port,
+        MAIL_USE_TLS=False,
+        MAIL_DEFAULT_SENDER="recallo@example.com",
+    )
+    init_mail(app)
+    return app
+
+
+def test_outbox_delivers_queued_email():
+    """Queued email reaches the SMTP server on the next delivery pass"""
+    print("🧪 Testing outbox delivery...")
+    handler = CollectingHandler()
+    controller = Controller(handler, hostname="localhost", port=SMTP_PORT)
+    controller.start()
+    try:
+        make_app(SMTP_PORT)
+        email_id = email_outbox.enqueue_email("learner@example.com", "Quiz results", html="<p>9/10</p>")
+        assert email_outbox.get_email(email_id)["status"] == "pending"
+
+        assert email_outbox.deliver_due_emails() == 1
+        assert email_outbox.get_email(email_id)["status"] == "sent"
+        assert len(handler.messages) == 1
+        assert handler.messages[0].rcpt_tos == ["learner@example.com"]
+    finally:
+        controller.stop()
+    print("✅ Outbox delivery test PASSED")
+
+
+def test_outbox_retries_when_smtp_is_down():
+    """A failed send is rescheduled with backoff instead of being lost"""
+    print("🧪 Testing outbox retry...")
+    make_app(SMTP_PORT + 1)  # nothing listening here
+    email_id = email_outbox.enqueue_email("learner@example.com", "Quiz results", html="<p>4/10</p>")
+
+    assert email_outbox.deliver_due_emails() == 0
+    row = email_outbox.get_email(email_id)
+    assert row["status"] == "pending"
+    assert row["attempts"] == 1
+    assert row["last_error"]
+    print("✅ Outbox retry test PASSED")
+
+
+def main():
+    """Run all outbox tests"""
+    test_outbox_delivers_queued_email()
+    test_outbox_retries_when_smtp_is_down()
+    print("🎉 All outbox tests passed")
+
+
+if __name__ == "__main__":
+    main()
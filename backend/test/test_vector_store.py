@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test script for the local HNSW vector store backend.
+
+Requires: pip install hnswlib (listed in ai-engine/requirements-optional.txt)
+"""
+
+import os
+import sys
+import random
+import tempfile
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("hnswlib")
+
+from vector_store import LocalHNSWBackend
+
+DIMENSION = 8
+
+
+def random_vector():
+    return [random.uniform(-1, 1) for _ in range(DIMENSION)]
+
+
+def make_vectors(user_id, file_uuid, count):
+    return [
+        (f"{file_uuid}_chunk_{i}", random_vector(), {"user_id": user_id, "file_uuid": file_uuid, "text": f"chunk {i}"})
+        for i in range(count)
+    ]
+
+
+def test_query_is_limited_to_user():
+    """A user only ever gets their own chunks back, best match first"""
+    print("🧪 Testing per-user filtering...")
+    store = LocalHNSWBackend(tempfile.mkdtemp(), dimension=DIMENSION)
+    alice = make_vectors("alice", "file-a", 20)
+    store.upsert(alice)
+    store.upsert(make_vectors("bob", "file-b", 20))
+
+    matches = store.query(alice[3][1], "alice", top_k=5)
+    assert len(matches) == 5
+    assert matches[0]["id"] == "file-a_chunk_3"
+    assert matches[0]["metadata"]["text"] == "chunk 3"
+    assert all(match["metadata"]["user_id"] == "alice" for match in matches)
+    assert [match["score"] for match in matches] == sorted((match["score"] for match in matches), reverse=True)
+    assert store.query(alice[3][1], "carol") == []
+    print("✅ Per-user filtering test PASSED")
+
+
+def test_upsert_replaces_and_delete_by_file():
+    """Re-upserting a chunk replaces it, and deleting a file removes all of its chunks"""
+    print("🧪 Testing updates and deletes...")
+    store = LocalHNSWBackend(tempfile.mkdtemp(), dimension=DIMENSION)
+    store.upsert(make_vectors("alice", "file-a", 10))
+    store.upsert(make_vectors("alice", "file-c", 10))
+
+    moved = random_vector()
+    store.upsert([("file-a_chunk_0", moved, {"user_id": "alice", "file_uuid": "file-a", "text": "updated"})])
+    top = store.query(moved, "alice", top_k=1)[0]
+    assert top["id"] == "file-a_chunk_0" and top["metadata"]["text"] == "updated"
+
+    store.delete_by_file("file-a")
+    matches = store.query(moved, "alice", top_k=20)
+    assert len(matches) == 10
+    assert all(match["id"].startswith("file-c_") for match in matches)
+    print("✅ Updates and deletes test PASSED")
+
+
+def test_processes_share_the_log_and_snapshots():
+    """A second store on the same directory sees writes, and reloads from a snapshot after a restart"""
+    print("🧪 Testing shared log and snapshots...")
+    directory = tempfile.mkdtemp()
+    writer = LocalHNSWBackend(directory, dimension=DIMENSION)
+    reader = LocalHNSWBackend(directory, dimension=DIMENSION)
+
+    vectors = make_vectors("alice", "file-a", 10)
+    writer.upsert(vectors)
+    assert reader.query(vectors[5][1], "alice", top_k=1)[0]["id"] == "file-a_chunk_5"
+
+    writer.snapshot()
+    writer.upsert(make_vectors("alice", "file-b", 5))
+    writer.snapshot()  # trims the rows the first snapshot covered
+    writer.delete_by_file("file-b")
+
+    restarted = LocalHNSWBackend(directory, dimension=DIMENSION)
+    assert len(restarted.query(vectors[5][1], "alice", top_k=50)) == 10
+    assert len(reader.query(vectors[5][1], "alice", top_k=50)) == 10
+    print("✅ Shared log and snapshots test PASSED")
+
+
+def test_snapshot_keeps_the_previous_one():
+    """A new snapshot leaves the previous one for processes still loading it, and removes older ones"""
+    print("🧪 Testing snapshot retention...")
+    directory = tempfile.mkdtemp()
+    store = LocalHNSWBackend(directory, dimension=DIMENSION)
+    for i in range(3):
+        store.upsert(make_vectors("alice", f"file-{i}", 5))
+        store.snapshot()
+
+    snapshots = sorted(entry for entry in os.listdir(directory) if entry.startswith("snapshot-"))
+    assert snapshots == ["snapshot-10", "snapshot-15"]
+    assert not [entry for entry in os.listdir(directory) if entry.endswith(".tmp")]
+    print("✅ Snapshot retention test PASSED")
+
+
+def main():
+    """Run all vector store tests"""
+    test_query_is_limited_to_user()
+    test_upsert_replaces_and_delete_by_file()
+    test_processes_share_the_log_and_snapshots()
+    test_snapshot_keeps_the_previous_one()
+    print("🎉 All vector store tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+-- Topic centroids for Recallo
+-- New topics are de-duplicated against the user's existing ones by cluster
+-- centroid. Titles alone are too generic ("Introduction", "Summary") to
+-- compare across documents. Topics saved before this column existed have no
+-- centroid and are not used for de-duplication.
+
+ALTER TABLE public.topics ADD COLUMN IF NOT EXISTS centroid real[];
+
+COMMIT;
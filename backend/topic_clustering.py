@@ -0,0 +1,101 @@
+import os
+import time
+import logging
+
+import numpy as np
+from sklearn.cluster import AgglomerativeClustering, MiniBatchKMeans
+from sklearn.neighbors import kneighbors_graph
+
+DISTANCE_THRESHOLD = 0.6
+# Up to this many chunks the full O(n^2) agglomerative clustering is cheap enough
+FULL_AGGLOMERATIVE_LIMIT = int(os.getenv("CLUSTER_FULL_LIMIT", 2000))
+# Up to this many chunks use agglomerative clustering on a sparse k-NN graph
+KNN_AGGLOMERATIVE_LIMIT = int(os.getenv("CLUSTER_KNN_LIMIT", 20000))
+KNN_NEIGHBORS = 15
+# Sample used to estimate the number of clusters for mini-batch k-means
+KMEANS_SAMPLE_SIZE = 2000
+
+
+def normalize_embeddings(embeddings):
+    """Return embeddings as a float32 array with unit-length rows."""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _agglomerative(matrix, connectivity=None):
+    clustering = AgglomerativeClustering(
+        n_clusters=None, distance_threshold=DISTANCE_THRESHOLD, connectivity=connectivity
+    )
+    return clustering.fit_predict(matrix)
+
+
+def _mini_batch_kmeans(matrix, random_state=42):
+    # Estimate the cluster count with the same agglomerative criterion on a random sample;
+    # topics in a document saturate quickly, so the sample count is used as-is
+    rng = np.random.default_rng(random_state)
+    sample_idx = rng.choice(len(matrix), size=min(KMEANS_SAMPLE_SIZE, len(matrix)), replace=False)
+    n_clusters = len(np.unique(_agglomerative(matrix[sample_idx])))
+
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=1024, n_init=3, random_state=random_state)
+    return kmeans.fit_predict(matrix)
+
+
+def cluster_embeddings(embeddings):
+    """
+    Cluster chunk embeddings into topics, choosing the algorithm by input size.
+
+    Returns:
+        (labels, stats) where labels is a NumPy array with one cluster label per
+        embedding and stats describes the strategy, timing and cluster count.
+    """
+    started = time.perf_counter()
+    matrix = normalize_embeddings(embeddings)
+    n = len(matrix)
+
+    if n < 2:
+        strategy = "single"
+        labels = np.zeros(n, dtype=int)
+    elif n <= FULL_AGGLOMERATIVE_LIMIT:
+        strategy = "agglomerative"
+        labels = _agglomerative(matrix)
+    elif n <= KNN_AGGLOMERATIVE_LIMIT:
+        strategy = "agglomerative_knn"
+        connectivity = kneighbors_graph(matrix, n_neighbors=KNN_NEIGHBORS, include_self=False, n_jobs=-1)
+        labels = _agglomerative(matrix, connectivity=connectivity)
+    else:
+        strategy = "minibatch_kmeans"
+        labels = _mini_batch_kmeans(matrix)
+
+    stats = {
+        "strategy": strategy,
+        "chunks": n,
+        "clusters": int(len(np.unique(labels))),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    logging.info(
+        f"🧩 Clustered {stats['chunks']} chunks into {stats['clusters']} topics "
+        f"with {strategy} in {stats['seconds']}s"
+    )
+    return labels, stats
+
+
+def group_chunks(chunks, labels):
+    """Map cluster label -> list of chunks, preserving document order within each cluster."""
+    clustered_chunks = {}
+    for chunk, label in zip(chunks, labels):
+        clustered_chunks.setdefault(int(label), []).append(chunk)
+    return clustered_chunks
+
+
+def cluster_centroids(embeddings, labels):
+    """Map cluster label -> unit-length mean of its normalized embeddings."""
+    matrix = normalize_embeddings(embeddings)
+    labels = np.asarray(labels)
+    centroids = {}
+    for label in np.unique(labels):
+        centroid = matrix[labels == label].mean(axis=0)
+        norm = np.linalg.norm(centroid)
+        centroids[int(label)] = centroid / norm if norm else centroid
+    return centroids
@@ -0,0 +1,139 @@
+import os
+import re
+import hashlib
+import logging
+
+import numpy as np
+
+# Cosine similarity between cluster centroids above which two topics are the same
+CENTROID_SIMILARITY_THRESHOLD = float(os.getenv("TOPIC_CENTROID_THRESHOLD", 0.92))
+# Estimated Jaccard similarity of title shingles above which two titles are the same
+TITLE_JACCARD_THRESHOLD = float(os.getenv("TOPIC_TITLE_JACCARD_THRESHOLD", 0.6))
+
+_NUM_PERM = 64
+_BANDS = 32
+_ROWS = _NUM_PERM // _BANDS
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(1)
+_PERM_A = _rng.integers(1, _PRIME, size=_NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _PRIME, size=_NUM_PERM, dtype=np.uint64)
+
+
+def normalize_title(title):
+    title = title.lower()
+    title = re.sub(r"[^a-z0-9\s]", "", title)  # remove punctuation
+    title = " ".join(title.split())  # normalize whitespace
+    return title
+
+
+def title_shingles(normalized_title, k=3):
+    """Character k-grams of the title, padded so short words still produce shingles."""
+    padded = f" {normalized_title} "
+    if len(padded) <= k:
+        return {padded}
+    return {padded[i:i + k] for i in range(len(padded) - k + 1)}
+
+
+def minhash_signature(shingles):
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") % _PRIME for s in shingles],
+        dtype=np.uint64
+    )
+    # (a * h + b) mod p for every permutation and shingle, then the per-permutation minimum
+    return ((np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _PRIME).min(axis=1)
+
+
+class TopicDedupIndex:
+    """
+    Near-duplicate detector for topic titles.
+
+    A topic is a duplicate when its cluster centroid is close (cosine) to a
+    known topic's centroid, or when its title's MinHash sketch is close to a
+    title added with add(). Title candidates come from LSH buckets, so a lookup costs
+    roughly O(1) instead of a comparison against every previous title.
+    """
+
+    def __init__(self, centroid_threshold=CENTROID_SIMILARITY_THRESHOLD, jaccard_threshold=TITLE_JACCARD_THRESHOLD):
+        self.centroid_threshold = centroid_threshold
+        self.jaccard_threshold = jaccard_threshold
+        self.titles = []
+        self.signatures = []
+        self.buckets = {}
+        self.centroids = []
+        self.centroid_titles = []
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _bands(self, signature):
+        for band in range(_BANDS):
+            yield band, signature[band * _ROWS:(band + 1) * _ROWS].tobytes()
+
+    def find_similar_title(self, title):
+        normalized = normalize_title(title)
+        if not normalized:
+            return None
+        signature = minhash_signature(title_shingles(normalized))
+
+        candidates = set()
+        for key in self._bands(signature):
+            candidates.update(self.buckets.get(key, ()))
+        for idx in sorted(candidates):
+            if np.mean(self.signatures[idx] == signature) >= self.jaccard_threshold:
+                return self.titles[idx]
+        return None
+
+    def find_similar_centroid(self, centroid):
+        if centroid is None or not self.centroids:
+            return None
+        similarities = np.vstack(self.centroids) @ centroid
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.centroid_threshold:
+            return self.centroid_titles[best]
+        return None
+
+    def find_duplicate(self, title, centroid=None):
+        """Return the title of a matching known topic, or None."""
+        return self.find_similar_centroid(centroid) or self.find_similar_title(title)
+
+    def add(self, title, centroid=None):
+        normalized = normalize_title(title)
+        if normalized:
+            signature = minhash_signature(title_shingles(normalized))
+            idx = len(self.titles)
+            self.titles.append(title)
+            self.signatures.append(signature)
+            for key in self._bands(signature):
+                self.buckets.setdefault(key, []).append(idx)
+        self.add_centroid(title, centroid)
+
+    def add_centroid(self, title, centroid):
+        """Index a topic by centroid only, so a similar title alone never matches it."""
+        if centroid is not None:
+            self.centroids.append(centroid)
+            self.centroid_titles.append(title)
+
+
+def centroid_to_row(centroid):
+    """A centroid as stored in topics.centroid (real[])."""
+    return None if centroid is None else [round(float(x), 6) for x in centroid]
+
+
+def load_user_topic_index(supabase, user_id):
+    """
+    Build an index seeded with the centroids of the topics the user already has.
+
+    Stored topics are matched by centroid only: across documents, generic
+    titles such as "Introduction" would otherwise hide genuinely new topics.
+    Topics saved without a centroid are left out.
+    """
+    index = TopicDedupIndex()
+    try:
+        response = supabase.table("topics").select("title, centroid").eq("user_id", user_id).execute()
+        for row in response.data or []:
+            if row.get("centroid"):
+                index.add_centroid(row.get("title"), np.asarray(row["centroid"], dtype=np.float64))
+        logging.info(f"Loaded {len(index.centroids)} existing topic centroids for user {user_id}")
+    except Exception as e:
+        logging.warning(f"⚠️ Could not load existing topics for user {user_id}: {e}")
+    return index
@@ -0,0 +1,120 @@
+import os
+import re
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_throttle import throttled_call
+
+TOPIC_LLM_WORKERS = int(os.getenv("TOPIC_LLM_WORKERS", 6))
+
+
+def clean_title(raw_title):
+    return raw_title.strip().replace("*", "").replace("-", "")
+
+
+_CODE_FENCE = re.compile(r"^```(?:json)?\s*(.*?)\s*```$", re.DOTALL)
+
+
+def parse_topic_json(raw_text):
+    """
+    Strictly parse a combined {"title", "summary"} response.
+
+    Returns (title, summary) or None when the output is not a single JSON
+    object with non-empty string title and summary.
+    """
+    text = raw_text.strip()
+    fenced = _CODE_FENCE.match(text)
+    if fenced:
+        text = fenced.group(1)
+    try:
+        data = json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        return None
+
+    if not isinstance(data, dict):
+        return None
+    title, summary = data.get("title"), data.get("summary")
+    if not isinstance(title, str) or not isinstance(summary, str):
+        return None
+    title, summary = clean_title(title), summary.strip()
+    if not title or not summary or "\n" in title:
+        return None
+    return title, summary
+
+
+def _generate_topic(label, content, topic_chain, title_chain, summary_chain):
+    """One combined title+summary call, falling back to two calls if the JSON doesn't parse."""
+    raw = throttled_call(topic_chain.run, content=content, label=f"topic #{label}")
+    parsed = parse_topic_json(raw)
+    if parsed:
+        return parsed
+
+    logging.warning(f"Structured topic output for cluster {label} did not parse, falling back to two calls")
+    title = clean_title(throttled_call(title_chain.run, content=content, label=f"title #{label}"))
+    summary = throttled_call(summary_chain.run, content=content, label=f"summary #{label}").strip()
+    return title, summary
+
+
+def generate_topic_texts(clustered_chunks, title_chain, summary_chain, topic_chain=None, max_workers=TOPIC_LLM_WORKERS):
+    """
+    Title and summarize every cluster concurrently.
+
+    With a topic_chain, each cluster costs one structured-output call that
+    returns both fields; title_chain/summary_chain are only used when that
+    output fails to parse. Without one, the title and summary requests are
+    submitted separately. Every request goes through the shared LLM rate
+    limiter, and results come back in cluster-label order so any later
+    de-duplication is deterministic.
+
+    Returns:
+        List of {"label", "merged_content", "title", "summary"} dicts
+
+    Raises:
+        RuntimeError: if any cluster could not be titled
+    """
+    labels = sorted(clustered_chunks)
+    contents = {label: "\n".join(clustered_chunks[label]) for label in labels}
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="topic-llm") as executor:
+        if topic_chain is not None:
+            futures = {
+                label: executor.submit(_generate_topic, label, contents[label], topic_chain, title_chain, summary_chain)
+                for label in labels
+            }
+            get_texts = lambda label: futures[label].result()
+        else:
+            title_futures = {
+                label: executor.submit(throttled_call, title_chain.run, content=contents[label], label=f"title #{label}")
+                for label in labels
+            }
+            summary_futures = {
+                label: executor.submit(throttled_call, summary_chain.run, content=contents[label], label=f"summary #{label}")
+                for label in labels
+            }
+            get_texts = lambda label: (
+                clean_title(title_futures[label].result()),
+                summary_futures[label].result().strip()
+            )
+
+        results = []
+        errors = []
+        for label in labels:
+            try:
+                title, summary = get_texts(label)
+            except Exception as e:
+                logging.error(f"Topic generation failed for cluster {label}: {e}")
+                errors.append(e)
+                continue
+            results.append({
+                "label": label,
+                "merged_content": contents[label],
+                "title": title,
+                "summary": summary,
+            })
+
+    logging.info(f"📝 Generated {len(results)}/{len(labels)} topic titles and summaries")
+    if errors:
+        # Dropping clusters would lose part of the file silently (or look like "no new topics" when the LLM is down)
+        raise RuntimeError(f"Topic generation failed for {len(errors)} of {len(labels)} clusters: {errors[0]}")
+    return results
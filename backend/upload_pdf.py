@@ -2,133 +2,113 @@ import uuid
 import os
 import logging
 from dotenv import load_dotenv
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain.schema import Document
-from config import PINECONE_API_KEY  # Ensure your API key is loaded correctly
 from datetime import datetime
-
-import pinecone
-print("pinecone module location:", pinecone.__file__)
-
+from embedding_pipeline import embed_in_batches
+from document_ingestion import iter_pdf_document_chunks
+from embedding_cache import get_cached_embeddings
+from retry_utils import call_with_retry
+from fetch_text_supabase import chunk_text_metadata
+from vector_store import get_vector_store
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize Pinecone client (using Pinecone class)
-from pinecone import Pinecone, ServerlessSpec
-
-# Create Pinecone instance
-pc = Pinecone(api_key=PINECONE_API_KEY)
-index_name = "document-index"
-
-# Optionally, list the indexes and check if your index exists
-if not pc.has_index(index_name):
-    # If the index does not exist, create it
-    pc.create_index(
-        name='document-index',
-        dimension=768,  # Adjust the dimension according to your embeddings
-        metric='cosine',  # Choose the appropriate similarity metric (Euclidean, cosine, etc.)
-        spec=ServerlessSpec(
-            cloud='aws',
-            region='us-east-1'  # Choose your preferred cloud region
-        )
-    )
-
-# Now you can access your Pinecone index
-index = pc.Index('document-index')
-
 def generate_unique_file_id():
     # Generate a unique UUID for each uploaded file
     return str(uuid.uuid4())  # Generate and return the UUID as a string
 
-def process_pdf(file_path, supabase, gemini_api_key, user_id,file_hash):
+def discard_partial_file(supabase, file_uuid, user_id):
+    """Remove whatever a failed ingestion already stored, so the file can be uploaded again."""
+    try:
+        call_with_retry(
+            lambda: supabase.table("documents").delete().eq("file_uuid", file_uuid).eq("user_id", user_id).execute(),
+            label="documents cleanup"
+        )
+        call_with_retry(get_vector_store().delete_by_file, file_uuid, label="vector cleanup")
+        logging.info(f"🧹 Removed partially ingested chunks of {file_uuid}")
+    except Exception as e:
+        logging.error(f"❌ Could not clean up partially ingested file {file_uuid}: {e}")
+
+def process_pdf(file_path, supabase, gemini_api_key, user_id, file_hash, file_uuid=None, file_name=None, progress=None):
+    stored_any = False
     try:
-        # Extract the filename automatically
-        file_name = os.path.basename(file_path)
-
-        # Step 1: Generate a unique identifier for the file
-        file_uuid = generate_unique_file_id()
-
-        # Step 2: Extract text from PDF
-        reader = PdfReader(file_path)
-        text = ""
-
-        for page_num, page in enumerate(reader.pages):
-            page_text = page.extract_text() or ""
-            
-            # Check for empty or unreadable pages and log a warning
-            if not page_text.strip():
-                logging.warning(f"Page {page_num} in the PDF is empty or contains invalid text.")
-            text += page_text
-        
+        # Extract the filename automatically unless the caller kept the original one
+        file_name = file_name or os.path.basename(file_path)
+
+        # Step 1: Generate a unique identifier for the file (callers may pre-assign one)
+        file_uuid = file_uuid or generate_unique_file_id()
+
+        # Step 2-3: Extract and chunk once per file hash (shared with the quiz path)
+        if progress:
+            progress("extract")
+        chunks = iter_pdf_document_chunks(file_path, file_hash, "retrieval")
+
+        # Step 4: Metadata shared by every body chunk of this file
+        metadata = {"file_name": file_name, "tag": "body", "file_uuid": file_uuid, "user_id": user_id}
+
+        # Step 5: Embedding function using Gemini API (cached by chunk content)
+        embedding_fn = get_cached_embeddings(gemini_api_key)
+        vector_store = get_vector_store()
+
+        # Step 6-9: Embed chunks in concurrent batches and persist each batch as soon as it is ready
+        if progress:
+            progress("embed")
+        total_stored = 0
+        for start, batch_texts, embeddings in embed_in_batches(embedding_fn, chunks):
+            # Step 7: Prepare rows for Supabase insertion (with embeddings)
+            rows = [
+                {
+                    "chunk_id": file_uuid + f"_chunk_{i}",
+                    "content": content,  # Document content
+                    "embedding": embedding,  # Embedding (vector for similarity search)
+                    "metadata": metadata,  # Metadata (including file_uuid)
+                    "filename": file_name,  # Insert filename directly
+                    "file_uuid": file_uuid,  # Store the unique file UUID with each chunk
+                    "user_id": user_id,  # Store the user ID with each chunk
+                    "uploaded_at": datetime.now().isoformat(),
+                    "hash_file": file_hash
+                }
+                for i, content, embedding in zip(range(start, start + len(batch_texts)), batch_texts, embeddings)
+            ]
+
+            # Step 8: Insert the rows into Supabase (store metadata); upsert so a retried insert can't duplicate chunks
+            stored_any = True
+            call_with_retry(
+                lambda: supabase.table("documents").upsert(rows, on_conflict="chunk_id").execute(),
+                label="documents insert"
+            )
+
+            # Step 9: Upsert the embeddings into the vector store, with the chunk text when it fits
+            vectors = [
+                (row["chunk_id"], row["embedding"], {"user_id": user_id, "file_name": file_name, "file_uuid": file_uuid,
+                                                     **chunk_text_metadata(row["content"], i)})
+                for i, row in enumerate(rows, start=start)
+            ]
+            call_with_retry(vector_store.upsert, vectors, label="vector upsert")
+
+            total_stored += len(rows)
+            logging.info(f"📦 Stored chunks {start}-{start + len(rows) - 1} ({total_stored} so far)")
+            if progress:
+                progress("embed", f"{total_stored} chunks stored")
+
         # If no text was extracted, raise an error
-        if not text.strip():
+        if not total_stored:
             raise ValueError("Empty or unreadable PDF.")
 
-        # Step 3: Chunk text
-        splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-        chunks = splitter.split_text(text)
-
-        # Check if chunking failed (no chunks generated)
-        if not chunks:
-            raise ValueError("Chunking failed, no chunks generated.")
-
-        # Step 4: Create LangChain Documents with metadata for body chunks and summary
-        docs = [
-            Document(page_content=chunk, metadata={"file_name": file_name, "tag": "body", "file_uuid": file_uuid, "user_id": user_id}) 
-            for chunk in chunks
-        ]
-        
-        # Debugging: Verify the metadata before storing
-        logging.debug(f"Documents to be inserted: {[doc.metadata for doc in docs]}")
-
-        # Step 5: Embedding function using Gemini API
-        embedding_fn = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            google_api_key=gemini_api_key
-        )
+        logging.info(f"✅ Embedded and stored {total_stored} chunks from '{file_name}' with unique UUID: {file_uuid}.")
+
+        if progress:
+            progress("persist")
 
-        # Step 6: Generate embeddings for each document chunk
-        embeddings = embedding_fn.embed_documents([doc.page_content for doc in docs])  # Generate embeddings for each chunk
-        
-        # Step 7: Prepare rows for Supabase insertion (with embeddings)
-        rows = [
-            {
-                "chunk_id": file_uuid + f"_chunk_{i}",
-                "content": doc.page_content,  # Document content
-                "embedding": embedding,  # Embedding (vector for similarity search)
-                "metadata": doc.metadata,  # Metadata (including file_uuid)
-                "filename": file_name,  # Insert filename directly
-                "file_uuid": file_uuid,  # Store the unique file UUID with each chunk
-                "user_id": user_id,  # Store the user ID with each chunk
-                "uploaded_at": datetime.now().isoformat(),
-                "hash_file": file_hash
-            }
-            for i, (doc, embedding) in enumerate(zip(docs, embeddings))  # Loop over docs and embeddings
-        ]
-        
-        # Step 8: Insert the rows into Supabase (store metadata)
-        insert_response = supabase.table("documents").insert(rows).execute()
-
-        logging.info(f"✅ Embedded and stored {len(docs)} chunks from '{file_name}' with unique UUID: {file_uuid}.")
-        
-        # Step 9: Upsert the embeddings into Pinecone (vector search)
-        vectors = [
-            (file_uuid + f"_chunk_{i}", embedding, {"user_id": user_id, "file_name": file_name, "file_uuid": file_uuid}) 
-            for i, embedding in enumerate(embeddings)
-        ]
-        
-        # Upsert vectors into Pinecone
-        index.upsert(vectors=vectors)
-        
         # Step 10: Clean up the uploaded PDF file (optional)
         os.remove(file_path)
         logging.info(f"🗑️ Deleted uploaded file: {file_path}")
 
-        return True, len(docs), file_name, file_uuid  # Return the UUID along with other info
+        return True, total_stored, file_name, file_uuid  # Return the UUID along with other info
 
     except Exception as e:
         logging.error(f"🚫 PDF processing failed: {str(e)}")
+        # Earlier batches are already stored; leaving them would block re-uploads and serve a half-ingested file
+        if stored_any:
+            discard_partial_file(supabase, file_uuid, user_id)
         return False, str(e), None, None  # Return None for UUID on failure
\ No newline at end of file
@@ -0,0 +1,364 @@
+"""
+Vector store for document chunk embeddings.
+
+VECTOR_BACKEND picks where vectors live:
+
+- "pinecone" (default): the hosted document-index.
+- "local": an hnswlib HNSW index under LOCAL_DATA_DIR, for single-node
+  deployments and for running the stack offline (pip install hnswlib, see
+  ai-engine/requirements-optional.txt).
+
+Both take (chunk_id, embedding, metadata) tuples and return matches as
+{"id", "score", "metadata"} dicts, best first, limited to one user's chunks.
+
+The local index is shared by the server and the ingestion worker processes
+through an append-only SQLite log. Writers append rows; every process applies
+the rows it has not seen before searching. snapshot() saves the index to disk
+so a restart does not replay the whole log, and trims log rows that an older
+snapshot already covers.
+"""
+
+import os
+import json
+import shutil
+import sqlite3
+import logging
+import threading
+from array import array
+
+import numpy as np
+
+from config import LOCAL_DATA_DIR, PINECONE_API_KEY
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").lower()
+VECTOR_DIMENSION = int(os.getenv("VECTOR_DIMENSION", 768))
+PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "document-index")
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", os.path.join(LOCAL_DATA_DIR, "vector_index"))
+HNSW_M = int(os.getenv("HNSW_M", 16))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 200))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 64))
+HNSW_INITIAL_CAPACITY = int(os.getenv("HNSW_INITIAL_CAPACITY", 10000))
+# Snapshot once this many log rows have been applied since the last one
+VECTOR_SNAPSHOT_EVERY = int(os.getenv("VECTOR_SNAPSHOT_EVERY", 5000))
+
+
+class PineconeBackend:
+    def __init__(self, index_name=PINECONE_INDEX_NAME, dimension=VECTOR_DIMENSION):
+        from pinecone import Pinecone, ServerlessSpec
+
+        pc = Pinecone(api_key=PINECONE_API_KEY)
+        if not pc.has_index(index_name):
+            pc.create_index(
+                name=index_name,
+                dimension=dimension,
+                metric="cosine",
+                spec=ServerlessSpec(cloud="aws", region="us-east-1")
+            )
+        self.index = pc.Index(index_name)
+
+    def upsert(self, vectors):
+        self.index.upsert(vectors=vectors)
+
+    def query(self, vector, user_id, top_k=5):
+        results = self.index.query(vector=vector, filter={"user_id": user_id}, top_k=top_k, include_metadata=True)
+        return [{"id": match.id, "score": match.score, "metadata": match.metadata or {}} for match in results.matches]
+
+    def delete_by_file(self, file_uuid):
+        # Serverless indexes can't delete by metadata filter, but every chunk id starts with its file uuid
+        for ids in self.index.list(prefix=f"{file_uuid}_chunk_"):
+            self.index.delete(ids=ids)
+
+    def snapshot(self):
+        """Nothing to do; Pinecone persists every write."""
+
+
+class LocalHNSWBackend:
+    def __init__(self, directory=LOCAL_VECTOR_DIR, dimension=VECTOR_DIMENSION):
+        if hnswlib is None:
+            raise ImportError("VECTOR_BACKEND=local requires hnswlib (pip install hnswlib)")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.dimension = dimension
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(directory, "vector_log.sqlite3"), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vector_log ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " op TEXT NOT NULL,"
+            " chunk_id TEXT,"
+            " file_uuid TEXT,"
+            " vector BLOB,"
+            " metadata TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vector_snapshot ("
+            " id INTEGER PRIMARY KEY CHECK (id = 1),"
+            " seq INTEGER NOT NULL,"
+            " path TEXT NOT NULL,"
+            " trimmed_seq INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+        with self._lock:
+            self._load_snapshot()
+
+    # --- in-memory state -------------------------------------------------
+
+    def _reset(self, index, next_label, seq):
+        self._index = index
+        self._next_label = next_label
+        self._indexed_below = next_label  # labels below this have their vector in the index
+        self._seq = seq
+        self._entries = {}       # label -> (chunk_id, metadata)
+        self._labels = {}        # chunk_id -> label
+        self._file_labels = {}   # file_uuid -> {label}
+        self._user_counts = {}   # user_id -> live vectors
+
+    def _new_index(self):
+        index = hnswlib.Index(space="cosine", dim=self.dimension)
+        index.init_index(max_elements=HNSW_INITIAL_CAPACITY, ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M,
+                         allow_replace_deleted=True)
+        return index
+
+    def _add_entry(self, label, chunk_id, metadata):
+        self._entries[label] = (chunk_id, metadata)
+        self._labels[chunk_id] = label
+        self._file_labels.setdefault(metadata.get("file_uuid"), set()).add(label)
+        user_id = metadata.get("user_id")
+        self._user_counts[user_id] = self._user_counts.get(user_id, 0) + 1
+
+    def _drop_entry(self, label):
+        chunk_id, metadata = self._entries.pop(label)
+        del self._labels[chunk_id]
+        self._file_labels.get(metadata.get("file_uuid"), set()).discard(label)
+        self._user_counts[metadata.get("user_id")] -= 1
+
+    def _snapshot_row(self):
+        return self._conn.execute("SELECT seq, path, trimmed_seq FROM vector_snapshot WHERE id = 1").fetchone()
+
+    def _load_snapshot(self):
+        row = self._snapshot_row()
+        while row is not None:
+            seq, path, _ = row
+            path = os.path.join(self.directory, path)
+            try:
+                index = hnswlib.Index(space="cosine", dim=self.dimension)
+                index.load_index(os.path.join(path, "index.bin"), allow_replace_deleted=True)
+                with open(os.path.join(path, "entries.json"), encoding="utf-8") as f:
+                    state = json.load(f)
+                break
+            except (OSError, RuntimeError):
+                # A snapshot is only removed once two newer ones are published; if ours
+                # went away in the meantime, load the one the log points at now
+                newer = self._snapshot_row()
+                if newer is None or newer[0] == seq:
+                    raise
+                row = newer
+        if row is None:
+            self._reset(self._new_index(), 0, 0)
+        else:
+            self._reset(index, state["next_label"], seq)
+            for label, chunk_id, metadata in state["entries"]:
+                self._add_entry(label, chunk_id, metadata)
+            logging.info(f"📂 Loaded vector snapshot at log position {seq} ({len(self._entries)} vectors)")
+        self._snapshot_seq = self._seq
+        self._replay()
+
+    # --- log replay ------------------------------------------------------
+
+    def _replay(self):
+        """Apply log rows written (by any process) since this process last looked."""
+        row = self._snapshot_row()
+        if row is not None and row[2] > self._seq:
+            # Rows we never applied were trimmed behind a newer snapshot; start from that one
+            self._load_snapshot()
+            return
+        rows = self._conn.execute(
+            "SELECT seq, op, chunk_id, file_uuid, vector, metadata FROM vector_log WHERE seq > ? ORDER BY seq",
+            (self._seq,)
+        ).fetchall()
+        if not rows:
+            return
+
+        added = {}      # label -> vector, for labels new to the index
+        updated = {}    # label -> vector, for labels already in the index
+        for seq, op, chunk_id, file_uuid, vector, metadata in rows:
+            if op == "upsert":
+                label = self._labels.get(chunk_id)
+                if label is None:
+                    label = self._next_label
+                    self._next_label += 1
+                else:
+                    self._drop_entry(label)
+                self._add_entry(label, chunk_id, json.loads(metadata))
+                (updated if label < self._indexed_below else added)[label] = vector
+            elif op == "delete_file":
+                # Vectors must be in the index before they can be marked deleted
+                self._add_vectors(added, updated)
+                for label in list(self._file_labels.pop(file_uuid, ())):
+                    self._drop_entry(label)
+                    self._index.mark_deleted(label)
+            self._seq = seq
+        self._add_vectors(added, updated)
+
+    def _add_vectors(self, added, updated):
+        if updated:
+            # Plain add_items updates an existing label in place
+            self._index.add_items(self._to_matrix(updated.values()), list(updated))
+        if added:
+            needed = self._index.get_current_count() + len(added)
+            if needed > self._index.get_max_elements():
+                self._index.resize_index(max(needed, 2 * self._index.get_max_elements()))
+            # New labels may reuse the slots of deleted vectors
+            self._index.add_items(self._to_matrix(added.values()), list(added), replace_deleted=True)
+        added.clear()
+        updated.clear()
+        self._indexed_below = self._next_label
+
+    def _to_matrix(self, vectors):
+        return np.array([np.frombuffer(vector, dtype=np.float32) for vector in vectors], dtype=np.float32)
+
+    # --- public API ------------------------------------------------------
+
+    def _append(self, rows):
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO vector_log (op, chunk_id, file_uuid, vector, metadata) VALUES (?, ?, ?, ?, ?)", rows
+                )
+            self._replay()
+            if self._seq - self._snapshot_seq >= VECTOR_SNAPSHOT_EVERY:
+                self.snapshot()
+
+    def upsert(self, vectors):
+        rows = []
+        for chunk_id, values, metadata in vectors:
+            if len(values) != self.dimension:
+                raise ValueError(f"Vector {chunk_id} has {len(values)} dimensions, expected {self.dimension}")
+            metadata = metadata or {}
+            rows.append(("upsert", chunk_id, metadata.get("file_uuid"), array("f", values).tobytes(), json.dumps(metadata)))
+        self._append(rows)
+
+    def query(self, vector, user_id, top_k=5):
+        with self._lock:
+            self._replay()
+            k = min(top_k, self._user_counts.get(user_id, 0))
+            if k == 0:
+                return []
+            entries = self._entries
+            query = np.asarray([vector], dtype=np.float32)
+
+            def belongs_to_user(label):
+                return entries[label][1].get("user_id") == user_id
+
+            self._index.set_ef(max(HNSW_EF_SEARCH, k))
+            try:
+                labels, distances = self._index.knn_query(query, k=k, num_threads=1, filter=belongs_to_user)
+            except RuntimeError:
+                # A very selective filter can leave the search short of k hits; retry exhaustively
+                self._index.set_ef(self._index.get_current_count())
+                labels, distances = self._index.knn_query(query, k=k, num_threads=1, filter=belongs_to_user)
+            return [
+                {"id": entries[int(label)][0], "score": 1.0 - float(distance), "metadata": dict(entries[int(label)][1])}
+                for label, distance in zip(labels[0], distances[0])
+            ]
+
+    def delete_by_file(self, file_uuid):
+        self._append([("delete_file", None, file_uuid, None, None)])
+
+    def snapshot(self):
+        """
+        Save the index to disk and trim log rows covered by the previous snapshot.
+
+        The files are written to a staging directory and renamed into place, so
+        a snapshot-<seq> directory is always complete, and the vector_snapshot
+        row is only pointed at it afterwards. The previous snapshot is kept, since
+        other processes may still be loading it; older ones are removed.
+        """
+        with self._lock:
+            self._replay()
+            current = self._snapshot_row()
+            if current is not None and current[0] >= self._seq:
+                return
+            name = f"snapshot-{self._seq}"
+            path = os.path.join(self.directory, name)
+            staging = os.path.join(self.directory, f".{name}.{os.getpid()}.tmp")
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            # Saved before taking the database lock so other writers aren't blocked meanwhile
+            self._index.save_index(os.path.join(staging, "index.bin"))
+            with open(os.path.join(staging, "entries.json"), "w", encoding="utf-8") as f:
+                json.dump({
+                    "next_label": self._next_label,
+                    "entries": [[label, chunk_id, metadata] for label, (chunk_id, metadata) in self._entries.items()]
+                }, f)
+            try:
+                os.rename(staging, path)
+            except OSError:
+                # Another process already saved the snapshot at this position
+                shutil.rmtree(staging, ignore_errors=True)
+
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                current = self._snapshot_row()
+                if current is not None and current[0] >= self._seq:
+                    # Another process published this or a newer snapshot while we were writing ours;
+                    # ours is removed by a later snapshot() once it is older than the previous one
+                    self._conn.rollback()
+                    return
+                # Keep the log since the previous snapshot so slightly stale processes can still catch up
+                trimmed_seq = current[0] if current is not None else 0
+                self._conn.execute("DELETE FROM vector_log WHERE seq <= ?", (trimmed_seq,))
+                self._conn.execute(
+                    "INSERT INTO vector_snapshot (id, seq, path, trimmed_seq) VALUES (1, ?, ?, ?)"
+                    " ON CONFLICT(id) DO UPDATE SET seq = excluded.seq, path = excluded.path,"
+                    " trimmed_seq = excluded.trimmed_seq",
+                    (self._seq, name, trimmed_seq)
+                )
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+            self._snapshot_seq = self._seq
+
+            for entry in os.listdir(self.directory):
+                seq = _snapshot_dir_seq(entry)
+                if seq is not None and seq < trimmed_seq:
+                    shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+            logging.info(f"💾 Saved vector snapshot at log position {self._seq} ({len(self._entries)} vectors)")
+
+
+def _snapshot_dir_seq(name):
+    """The log position of a published snapshot-<seq> directory, or None for anything else."""
+    prefix, _, seq = name.partition("-")
+    if prefix == "snapshot" and seq.isdigit():
+        return int(seq)
+    return None
+
+BACKENDS = {
+    "pinecone": PineconeBackend,
+    "local": LocalHNSWBackend,
+}
+
+_store = None
+_store_pid = None
+_store_lock = threading.Lock()
+
+
+def get_vector_store():
+    """The process-wide vector store selected by VECTOR_BACKEND."""
+    global _store, _store_pid
+    with _store_lock:
+        # Forked ingestion workers must not share the parent's SQLite connection
+        if _store is None or _store_pid != os.getpid():
+            if VECTOR_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown VECTOR_BACKEND: {VECTOR_BACKEND}")
+            _store = BACKENDS[VECTOR_BACKEND]()
+            _store_pid = os.getpid()
+            logging.info(f"🧭 Using {VECTOR_BACKEND} vector store")
+        return _store
@@ -10,6 +10,7 @@ import Typewriter from "./Typewriter";
 import ChatInput from "./ChatInput";
 import History from "./History";
 import supabase from "../utils/supabaseClient";
+import readEventStream from "../utils/readEventStream";
 import RecalloVisual3D from "../components/RecalloVisual3D";
 import { useLocation, useNavigate } from "react-router-dom";
 
@@ -203,7 +204,7 @@ const ChatInterface = () => {
       }
 
       const response = await fetch(
-        `http://localhost:5000/${useDocumentMode ? "ask" : "chat"}`,
+        `http://localhost:5000/${useDocumentMode ? "ask" : "chat"}/stream`,
         {
           method: "POST",
           headers: { "Content-Type": "application/json" },
@@ -211,29 +212,41 @@ const ChatInterface = () => {
           signal: abortController.signal,
         }
       );
-
-      const data = await response.json();
-
-      if (data.conversation_id && !currentConv) {
-        setCurrentConv(data.conversation_id);
-        // Update conversations list with the new conversation
-        setConversations(prev => [{ 
-          conversation_id: data.conversation_id, 
-          title: "New Chat",
-          created_at: new Date().toISOString(),
-          updated_at: new Date().toISOString()
-        }, ...prev]);
+      if (!response.ok || !response.body) {
+        throw new Error(`Request failed with status ${response.status}`);
       }
 
-      const aiReply = {
-        id: Date.now() + 1,
-        type: "ai",
-        text: data.response || "Sorry, I couldn't generate a response.",
-      };
-
-      setMessages((prev) =>
-        prev.map((msg) => (msg.id === "loading-spinner" ? aiReply : msg))
-      );
+      // Replace the spinner with the reply and grow it as tokens arrive
+      const replyId = Date.now() + 1;
+      let replyText = "";
+      const showReply = (text) =>
+        setMessages((prev) =>
+          prev.map((msg) =>
+            msg.id === "loading-spinner" || msg.id === replyId
+              ? { id: replyId, type: "ai", text }
+              : msg
+          )
+        );
+
+      await readEventStream(response, (event, data) => {
+        if (event === "conversation" && data.conversation_id && !currentConv) {
+          setCurrentConv(data.conversation_id);
+          // Update conversations list with the new conversation
+          setConversations(prev => [{
+            conversation_id: data.conversation_id,
+            title: "New Chat",
+            created_at: new Date().toISOString(),
+            updated_at: new Date().toISOString()
+          }, ...prev]);
+        } else if (event === "token") {
+          replyText += data.text;
+          showReply(replyText);
+        } else if (event === "done") {
+          showReply(data.response || "Sorry, I couldn't generate a response.");
+        } else if (event === "error") {
+          throw new Error(data.error || "Streaming failed");
+        }
+      });
     } catch (error) {
       console.error("Error:", error);
       const errorReply = {
@@ -244,9 +257,10 @@ const ChatInterface = () => {
             ? "⚠️ Response stopped by user."
             : "⚠️ Something went wrong. Please try again.",
       };
-      setMessages((prev) =>
-        prev.map((msg) => (msg.id === "loading-spinner" ? errorReply : msg))
-      );
+      setMessages((prev) => [
+        ...prev.filter((msg) => msg.id !== "loading-spinner"),
+        errorReply,
+      ]);
     } finally {
       setLoading(false);
       setController(null);
@@ -3,6 +3,7 @@ import { useEffect } from "react";
 import { FontAwesomeIcon } from "@fortawesome/react-fontawesome";
 import { faPlus } from "@fortawesome/free-solid-svg-icons";
 import { Tooltip } from "bootstrap";
+import waitForJob from "../utils/waitForJob";
 
 const FileUpload = ({ onFileSelect, disableDefaultUpload = false }) => {
   useEffect(() => {
@@ -52,7 +53,17 @@ const FileUpload = ({ onFileSelect, disableDefaultUpload = false }) => {
 
       const data = await res.json();
 
-      if (res.ok) {
+      if (res.status === 202) {
+        // The file is processed in the background; report the outcome once it finishes
+        console.log("⏳ Upload queued:", data);
+        try {
+          await waitForJob(data.job_id, userId);
+          console.log("✅ File processed:", file.name);
+        } catch (err) {
+          console.error("❌ Processing failed:", err);
+          alert("Processing failed: " + err.message);
+        }
+      } else if (res.ok) {
         console.log("✅ Upload success:", data);
       } else {
         const errMsg = data.error || data.message || "Unknown error";
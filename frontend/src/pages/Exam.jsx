@@ -2,6 +2,7 @@ import React, { useState, useEffect, useCallback } from "react";
 import Sidebar from "../components/Sidebar";
 import History from "../components/History";
 import useSession from "../utils/useSession";
+import readEventStream from "../utils/readEventStream";
 import { EqualApproximately } from "lucide-react";
 import "bootstrap/dist/css/bootstrap.min.css";
 import { useLocation, useNavigate } from "react-router-dom";
@@ -36,44 +37,62 @@ const Exam = () => {
   const [timeLeft, setTimeLeft] = useState(600); // 10 minutes in seconds
   const [questions, setQuestions] = useState([]); // Holds fetched questions
   const [answers, setAnswers] = useState([]); // User answers for each question
+  const [quizSaved, setQuizSaved] = useState(false); // Set by the stream's "done" event
 
-  // Function to fetch questions from backend on "Start Exam"
+  // Function to stream questions from backend on "Start Exam"; the exam starts
+  // with the first question and the rest are appended as they are generated
   const startExam = async () => {
     if (!topicId) {
       alert("Topic ID not specified. Cannot start exam.");
       return;
     }
     setLoadingQuestions(true);
+    setQuizSaved(false);
+    let received = 0;
+    let saved = false;
     try {
-      const res = await fetch("http://localhost:5000/generate-questions", {
+      const res = await fetch("http://localhost:5000/generate-questions/stream", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ topic_id: topicId, difficulty_mode: "hard", user_id: userId }),
       });
-      const data = await res.json();
-
-      if (res.ok && data.questions && data.questions.length > 0) {
-        setQuestions(data.questions);
-
-        setAnswers(Array(data.questions.length).fill(null)); // Initialize answers array
-        setExamStarted(true);
-        setTimeLeft(600); // Reset timer on start
-        console.log("📋 Loaded Questions:");
-        data.questions.forEach((q, index) => {
-          console.log(
-            `Question ${index + 1} | ID: ${q.question_id || q.id} | Text: ${
-              q.question_text
-            }`
-          );
-        });
-      } else {
-        alert(
-          "Failed to generate questions: " +
-            (data.error || "No questions received")
-        );
+      if (!res.ok || !res.body) {
+        const data = await res.json().catch(() => ({}));
+        throw new Error(data.error || `Request failed with status ${res.status}`);
+      }
+
+      await readEventStream(res, (event, payload) => {
+        if (event === "question") {
+          received += 1;
+          console.log(`Question ${received} | ID: ${payload.question_id} | Text: ${payload.question_text}`);
+          setQuestions((prev) => [...prev, payload]);
+          setAnswers((prev) => [...prev, null]);
+          if (received === 1) {
+            setExamStarted(true);
+            setTimeLeft(600); // Reset timer on start
+          }
+        } else if (event === "done") {
+          saved = true;
+          setQuizSaved(true);
+        } else if (event === "error") {
+          throw new Error(payload.error || "Question generation failed");
+        }
+      });
+
+      if (received === 0) {
+        alert("Failed to generate questions: No questions received");
+      } else if (!saved) {
+        // The connection closed before the quiz was saved
+        throw new Error("The quiz stream ended unexpectedly");
       }
     } catch (err) {
       alert("Error fetching questions: " + err.message);
+      if (received > 0) {
+        // The quiz was not saved, so it can't be submitted
+        setExamStarted(false);
+        setQuestions([]);
+        setAnswers([]);
+      }
     } finally {
       setLoadingQuestions(false);
     }
@@ -196,14 +215,18 @@ const Exam = () => {
 
   // Handle option selection for a question
   const handleOptionChange = (qIndex, optionIndex) => {
-    const updatedAnswers = [...answers];
-    updatedAnswers[qIndex] = optionIndex;
-    setAnswers(updatedAnswers);
+    setAnswers((prev) => {
+      const updatedAnswers = [...prev];
+      updatedAnswers[qIndex] = optionIndex;
+      return updatedAnswers;
+    });
   };
 
-  // Check if all questions are answered
+  // Check if all questions are answered (and the quiz has been saved)
   const allAnswered =
-    answers.length === questions.length && answers.every((a) => a !== null);
+    quizSaved &&
+    answers.length === questions.length &&
+    answers.every((a) => a !== null);
 
   if (isTopicMissing) {
     return (
@@ -17,6 +17,7 @@ import { ChevronDown, ChevronUp } from "lucide-react";
 import { ClockPlus } from "lucide-react";
 import { FolderArchive } from 'lucide-react';
 import supabase from "../utils/supabaseClient";
+import waitForJob from "../utils/waitForJob";
 
 const Topics = () => {
   const {
@@ -165,9 +166,23 @@ const Topics = () => {
           }
         };
 
-        // 👇 Fires after upload is complete but while server is generating topics
-        xhr.onload = () => {
-          if (xhr.status === 200) {
+        // 👇 Fires after upload is complete; topics are generated by a background job
+        xhr.onload = async () => {
+          if (xhr.status === 202) {
+            try {
+              const { job_id } = JSON.parse(xhr.responseText);
+              const job = await waitForJob(job_id, userId, showJobProgress);
+              setProgress(100);
+              alert(
+                job.result?.message ||
+                  "File processed successfully. Topics saved to Supabase."
+              );
+              fetchTopics();
+              resolve();
+            } catch (err) {
+              reject(err);
+            }
+          } else if (xhr.status === 200) {
             setProgress(100); // Full progress only after server responds
             const result = JSON.parse(xhr.responseText);
             alert(
@@ -196,6 +211,13 @@ const Topics = () => {
     }
   };
 
+  // Map the ingestion job's stage onto 90-99% while it runs
+  const showJobProgress = (job) => {
+    if (job.stage_index != null) {
+      setProgress(90 + Math.floor((job.stage_index / job.stages.length) * 10));
+    }
+  };
+
   const handleEditTopic = async (topicId) => {
     if (!newTitle.trim()) return;
 
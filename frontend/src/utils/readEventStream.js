@@ -0,0 +1,31 @@
+// utils/readEventStream.js
+// Reads a Server-Sent Events response body from fetch() and calls
+// onEvent(eventName, data) for each event, with data parsed as JSON.
+const readEventStream = async (response, onEvent) => {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  const dispatch = (rawEvent) => {
+    let event = "message";
+    let data = "";
+    rawEvent.split("\n").forEach((line) => {
+      if (line.startsWith("event: ")) event = line.slice(7);
+      else if (line.startsWith("data: ")) data += line.slice(6);
+    });
+    if (data) onEvent(event, JSON.parse(data));
+  };
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      dispatch(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+    }
+  }
+};
+
+export default readEventStream;
@@ -0,0 +1,19 @@
+// utils/waitForJob.js
+// Polls a background ingestion job until it finishes. Resolves with the job
+// when it is done, rejects with its error when it fails, and calls
+// onProgress(job) on every poll in between.
+const waitForJob = async (jobId, userId, onProgress, intervalMs = 2000) => {
+  for (;;) {
+    await new Promise((r) => setTimeout(r, intervalMs));
+    const res = await fetch(
+      `http://127.0.0.1:5000/api/jobs/${jobId}?user_id=${encodeURIComponent(userId)}`
+    );
+    const job = await res.json();
+    if (!res.ok) throw new Error(job.error || "Failed to check processing status");
+    if (job.status === "done") return job;
+    if (job.status === "failed") throw new Error(job.error || "Failed to process the file.");
+    if (onProgress) onProgress(job);
+  }
+};
+
+export default waitForJob;